@@ -38,6 +38,9 @@ async def main():
         log("fatal", f"Agent failed: {e}")
         raise
 
+    finally:
+        await multi_mcp.shutdown()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,47 @@
+# bench_chunking.py → Chunker comparison
+# Runs the LLM segmenter (semantic_merge) and the embedding-similarity chunker
+# (embedding_chunk) over the same extracted markdown and reports chunk counts,
+# average chunk size and wall time per document.
+#
+# Usage: python bench_chunking.py [documents/cricket.txt ...] [--modes llm,embedding]
+
+import argparse
+import time
+from pathlib import Path
+
+from mcp_server_2 import ROOT, chunk_markdown, extract_markdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM and embedding chunking per document")
+    parser.add_argument("files", nargs="*", help="documents to chunk (default: everything in documents/)")
+    parser.add_argument("--modes", default="llm,embedding")
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] or sorted((ROOT / "documents").glob("*.*"))
+    modes = args.modes.split(",")
+
+    print(f"{'document':<45} {'words':>7} " + " ".join(f"{m + ' chunks':>17} {m + ' s':>12}" for m in modes))
+    totals = {m: 0.0 for m in modes}
+    for file in files:
+        try:
+            markdown = extract_markdown(str(file))
+        except Exception as e:
+            print(f"{file.name[:45]:<45} extraction failed: {e}")
+            continue
+
+        row = f"{file.name[:45]:<45} {len(markdown.split()):>7} "
+        for mode in modes:
+            t0 = time.perf_counter()
+            chunks = chunk_markdown(markdown, mode=mode)
+            elapsed = time.perf_counter() - t0
+            totals[mode] += elapsed
+            avg = sum(len(c) for c in chunks) / max(1, len(chunks))
+            row += f"{len(chunks):>8} ({avg:>5.0f}c) {elapsed:>12.2f} "
+        print(row)
+
+    print("\nTotal seconds: " + ", ".join(f"{m}={t:.2f}" for m, t in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_compression.py → Vector encoding report
+# For each vector encoding from modules/index_factory.py, builds the index over
+# the vectors in faiss_index/ and reports its serialized size against float32,
+# plus recall@k against exact search with and without exact re-ranking.
+#
+# Usage: python bench_compression.py [--kind flat] [--k 5] [--rerank-factor 4]
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from bench_index import load_vectors, recall_at_k
+from modules.index_factory import INDEX_KINDS, VECTOR_ENCODINGS, build_populated_index
+
+
+def rerank(vectors: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    out = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, (q, ids) in enumerate(zip(queries, candidates)):
+        ids = ids[ids >= 0]
+        order = np.argsort(((vectors[ids] - q) ** 2).sum(axis=1))[:k]
+        out[row, :len(order)] = ids[order]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory saved vs recall lost per vector encoding")
+    parser.add_argument("--kind", default="flat", choices=INDEX_KINDS)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = np.ascontiguousarray(load_vectors(), dtype=np.float32)
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    noise = rng.normal(scale=vectors.std() * 0.05, size=(len(picks), vectors.shape[1]))
+    queries = (vectors[picks] + noise).astype(np.float32)
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {args.kind} index, k={args.k}\n")
+
+    _, truth = build_populated_index("flat", vectors).search(queries, args.k)
+    baseline_bytes = None
+
+    print(f"{'encoding':<9} {'size MB':>8} {'saved':>7} {'recall@k':>9} {'+rerank':>8} {'ms/query':>9}")
+    for encoding in VECTOR_ENCODINGS:
+        try:
+            index = build_populated_index(args.kind, vectors, encoding=encoding)
+        except (RuntimeError, ValueError) as e:
+            print(f"{encoding:<9} skipped: {e}")
+            continue
+        size = len(faiss.serialize_index(index))
+        baseline_bytes = baseline_bytes or size
+
+        t0 = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        _, wide = index.search(queries, args.k * args.rerank_factor)
+        reranked = rerank(vectors, queries, wide, args.k)
+
+        print(
+            f"{encoding:<9} {size / 1e6:>8.2f} {1 - size / baseline_bytes:>7.1%} "
+            f"{recall_at_k(found, truth):>9.3f} {recall_at_k(reranked, truth):>8.3f} {ms:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# bench_hybrid.py → Retrieval benchmark: vector vs BM25 vs hybrid
+# Runs a small labelled query set through search_chunks in each mode and
+# reports hit@k (expected document among the top-k sources) and p50/p99 latency.
+#
+# Usage: python bench_hybrid.py [--k 5] [--modes vector,lexical,hybrid]
+
+import argparse
+import time
+
+import numpy as np
+
+from mcp_server_2 import search_chunks
+
+# (query, document that should appear in the results)
+LABELLED_QUERIES = [
+    ("INVG/67564", "INVG67564.pdf"),
+    ("NSE circular 463/2025", "INVG67564.pdf"),
+    ("SEBI interim order Gensol Engineering", "INVG67564.pdf"),
+    ("Anmol and Puneet Singh Jaggi luxury apartment", "economic.md"),
+    ("₹43 crore apartment The Camellias", "economic.md"),
+    ("Chaudhary Raghvendra Singh founded DLF 1946", "dlf.md"),
+    ("DLF Gateway Tower Gurugram 122 002", "DLF_13072023190044_BRSR.pdf"),
+    ("Business Responsibility and Sustainability Report", "DLF_13072023190044_BRSR.pdf"),
+    ("22-yard pitch wicket bails stumps", "cricket.txt"),
+    ("canvas.theschoolofai.com invitation", "How to use Canvas LMS.pdf"),
+    ("Tesla Roadster patents open innovation carbon crisis", "Tesla_Motors_IP_Open_Innovation_and_the_Carbon_Crisis_-_Matthew_Rimmer.pdf"),
+    ("Matthew Rimmer August 2014", "Tesla_Motors_IP_Open_Innovation_and_the_Carbon_Crisis_-_Matthew_Rimmer.pdf"),
+    ("experience letter worked in our organization", "Experience Letter.docx"),
+    ("Indian Policies and Procedures school district tribe LEA", "SAMPLE-Indian-Policies-and-Procedures-January-2023.docx"),
+    ("microsoft markitdown convert office documents to Markdown", "markitdown.md"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector, BM25 and hybrid retrieval")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--modes", default="vector,lexical,hybrid")
+    args = parser.parse_args()
+
+    # Warm up: index load, chunk store open, embedding model load
+    search_chunks(LABELLED_QUERIES[0][0], k=args.k)
+
+    print(f"{len(LABELLED_QUERIES)} labelled queries, k={args.k}\n")
+    print(f"{'mode':<8} {'hit@k':>6} {'p50 ms':>8} {'p99 ms':>8}  misses")
+    for mode in args.modes.split(","):
+        hits, latencies, misses = 0, [], []
+        for query, expected in LABELLED_QUERIES:
+            t0 = time.perf_counter()
+            results = search_chunks(query, k=args.k, mode=mode)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if any(r["doc"] == expected for r in results):
+                hits += 1
+            else:
+                misses.append(query)
+        print(
+            f"{mode:<8} {hits / len(LABELLED_QUERIES):>6.2f} "
+            f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f}  "
+            + "; ".join(misses)
+        )
+
+
+if __name__ == "__main__":
+    main()
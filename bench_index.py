@@ -0,0 +1,82 @@
+# bench_index.py → ANN index benchmark
+# Compares every index kind from modules/index_factory.py against the exact
+# Flat baseline on the vectors in faiss_index/: recall@k and p50/p99 latency.
+#
+# Usage: python bench_index.py [--k 5] [--queries 200] [--kinds flat,ivf_flat,hnsw,ivf_pq]
+
+import argparse
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from modules.chunk_store import ChunkStore
+from modules.index_factory import INDEX_KINDS, build_populated_index
+
+ROOT = Path(__file__).parent.resolve()
+INDEX_DIR = ROOT / "faiss_index"
+
+
+def load_vectors() -> np.ndarray:
+    chunks_db = INDEX_DIR / "chunks.db"
+    if chunks_db.exists():
+        _, vectors = ChunkStore(chunks_db).all_vectors()
+        if len(vectors):
+            return vectors
+    index = faiss.read_index(str(INDEX_DIR / "index.bin"))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def time_queries(index, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, I = index.search(q.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append(I[0])
+    return np.array(latencies), np.stack(results)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+    return hits / max(1, (truth >= 0).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index kinds against exact Flat search")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--kinds", default=",".join(INDEX_KINDS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = np.ascontiguousarray(load_vectors(), dtype=np.float32)
+    rng = np.random.default_rng(args.seed)
+    # Queries: stored vectors with a little noise, so the nearest neighbour isn't trivially itself
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    noise = rng.normal(scale=vectors.std() * 0.05, size=(len(picks), vectors.shape[1]))
+    queries = (vectors[picks] + noise).astype(np.float32)
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}\n")
+
+    exact = build_populated_index("flat", vectors)
+    _, truth = time_queries(exact, queries, args.k)
+
+    print(f"{'index':<10} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for kind in args.kinds.split(","):
+        try:
+            t0 = time.perf_counter()
+            index = build_populated_index(kind, vectors)
+            build_s = time.perf_counter() - t0
+        except (RuntimeError, ValueError) as e:
+            print(f"{kind:<10} skipped: {e}")
+            continue
+        latencies, found = time_queries(index, queries, args.k)
+        print(
+            f"{kind:<10} {build_s:>8.2f} {recall_at_k(found, truth):>9.3f} "
+            f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
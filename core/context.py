@@ -23,6 +23,7 @@
 
 from typing import List, Optional, Dict, Any
 from modules.memory import MemoryManager, MemoryItem
+from modules.embedders import create_embedder
 from pathlib import Path
 import yaml
 import time
@@ -58,9 +59,12 @@ class AgentContext:
         self.agent_profile = profile or AgentProfile()
         self.session_id = f"session-{int(time.time())}-{uuid.uuid4().hex[:6]}"
         self.step = 0
+        memory_config = self.agent_profile.memory_config
         self.memory = MemoryManager(
-            embedding_model_url=self.agent_profile.memory_config["embedding_url"],
-            model_name=self.agent_profile.memory_config["embedding_model"]
+            embedding_model_url=memory_config["embedding_url"],
+            model_name=memory_config["embedding_model"],
+            # Optional config/models.json key, e.g. "nomic" (in-process) or "hashing"
+            embedder=create_embedder(memory_config["embedder"]) if memory_config.get("embedder") else None,
         )
         self.memory_trace: List[MemoryItem] = []
         self.tool_calls: List[ToolCallTrace] = []
@@ -5,7 +5,7 @@ from core.context import AgentContext
 from core.session import MultiMCP
 from core.strategy import decide_next_action
 from modules.perception import extract_perception, PerceptionResult
-from modules.action import ToolCallResult, parse_function_call
+from modules.action import ToolCallResult, parse_function_calls
 from modules.memory import MemoryItem
 import json
 
@@ -23,7 +23,23 @@ class AgentLoop:
         parameters = getattr(tool, "parameters", {})
         return list(parameters.keys()) == ["input"]
 
-    
+    async def _execute(self, tool_name: str, arguments: dict) -> str:
+        """Run one tool call and return its result as text."""
+        if self.tool_expects_input(tool_name):
+            tool_input = {'input': arguments} if not (isinstance(arguments, dict) and 'input' in arguments) else arguments
+        else:
+            tool_input = arguments
+
+        response = await self.mcp.call_tool(tool_name, tool_input)
+
+        # ✅ Safe TextContent parsing
+        raw = getattr(response.content, 'text', str(response.content))
+        try:
+            result_obj = json.loads(raw) if raw.strip().startswith("{") else raw
+        except json.JSONDecodeError:
+            result_obj = raw
+
+        return result_obj.get("markdown") if isinstance(result_obj, dict) else str(result_obj)
 
     async def run(self) -> str:
         print(f"[agent] Starting session: {self.context.session_id}")
@@ -109,44 +125,51 @@ class AgentLoop:
                     break
 
 
-                # ⚙️ Tool Execution
+                # ⚙️ Tool Execution — independent calls from one plan run concurrently
                 try:
-                    tool_name, arguments = parse_function_call(plan)
-
-                    if self.tool_expects_input(tool_name):
-                        tool_input = {'input': arguments} if not (isinstance(arguments, dict) and 'input' in arguments) else arguments
-                    else:
-                        tool_input = arguments
-
-                    response = await self.mcp.call_tool(tool_name, tool_input)
-
-                    # ✅ Safe TextContent parsing
-                    raw = getattr(response.content, 'text', str(response.content))
-                    try:
-                        result_obj = json.loads(raw) if raw.strip().startswith("{") else raw
-                    except json.JSONDecodeError:
-                        result_obj = raw
-
-                    result_str = result_obj.get("markdown") if isinstance(result_obj, dict) else str(result_obj)
-                    print(f"[action] {tool_name} → {result_str}")
-
-                    # 🧠 Add memory
-                    memory_item = MemoryItem(
-                        text=f"{tool_name}({arguments}) → {result_str}",
-                        type="tool_output",
-                        tool_name=tool_name,
-                        user_query=query,
-                        tags=[tool_name],
-                        session_id=self.context.session_id
+                    calls = parse_function_calls(plan)
+                    if len(calls) > 1:
+                        print(f"[action] Running {len(calls)} tool calls in parallel")
+                    results = await asyncio.gather(
+                        *(self._execute(name, args) for name, args in calls),
+                        return_exceptions=True,
                     )
-                    self.context.add_memory(memory_item)
+                    if all(isinstance(r, Exception) for r in results):
+                        raise results[0]  # nothing succeeded: end the step, as a failed single call always has
+
+                    for i, ((tool_name, arguments), result_str) in enumerate(zip(calls, results)):
+                        if isinstance(result_str, Exception):
+                            # Reported back to the planner, but never remembered as a fact
+                            print(f"[error] Tool {tool_name} failed: {result_str}")
+                            results[i] = f"ERROR: {result_str}"
+                            continue
+                        print(f"[action] {tool_name} → {result_str}")
+
+                        # 🧠 Add memory
+                        memory_item = MemoryItem(
+                            text=f"{tool_name}({arguments}) → {result_str}",
+                            type="tool_output",
+                            tool_name=tool_name,
+                            user_query=query,
+                            tags=[tool_name],
+                            session_id=self.context.session_id
+                        )
+                        self.context.add_memory(memory_item)
+
+                    if len(calls) == 1:
+                        result_block = results[0]
+                    else:
+                        result_block = "\n\n".join(
+                            f"[{i}] {tool_name}({arguments}) →\n{result_str}"
+                            for i, ((tool_name, arguments), result_str) in enumerate(zip(calls, results), start=1)
+                        )
 
                     # 🔁 Next query
                     query = f"""Original user task: {self.context.user_input}
 
     Your last tool produced this result:
 
-    {result_str}
+    {result_block}
 
     If this fully answers the task, return:
     FINAL_ANSWER: your answer
@@ -1,10 +1,24 @@
 # core/session.py
 
+import ast
+import asyncio
+import hashlib
+import json
 import os
 import sys
+import time
+from pathlib import Path
 from typing import Optional, Any, List, Dict
+import anyio
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.types import Tool
+
+ROOT = Path(__file__).parent.parent
+TOOL_CATALOG = ROOT / ".cache" / "tool_catalog.json"
+IDLE_TIMEOUT = 300.0   # seconds without calls before a server is stopped (config key idle_timeout; None disables)
+REAP_INTERVAL = 5.0    # how often MultiMCP looks for idle servers
+CLOSE_TIMEOUT = 5.0    # grace period for a server to exit before its task is cancelled
 
 
 class MCP:
@@ -47,61 +61,472 @@ class MCP:
                 return await session.call_tool(tool_name, arguments=arguments)
 
 
+def _server_params(config: dict) -> StdioServerParameters:
+    return StdioServerParameters(
+        command=sys.executable,
+        args=[config["script"]],
+        cwd=config.get("cwd", os.getcwd())
+    )
+
+
+def server_fingerprint(config: dict) -> str:
+    """
+    Hash of the server's config, its script and the local modules the script
+    imports directly (e.g. models.py, which defines the tool input schemas).
+    Any edit to those changes the fingerprint and invalidates cached tools.
+    """
+    cwd = Path(config.get("cwd", os.getcwd()))
+    script = cwd / config["script"]
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8"))
+    source = script.read_bytes()
+    digest.update(source)
+    modules = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.add(node.module)
+    for module in sorted(modules):
+        local = cwd / (module.replace(".", "/") + ".py")
+        if local.is_file():
+            digest.update(module.encode("utf-8"))
+            digest.update(local.read_bytes())
+    return digest.hexdigest()
+
+
+class ServerExited(ConnectionError):
+    """The MCP server process went away while a request was outstanding."""
+
+
+async def _relay(source, sink, eof: asyncio.Event):
+    """Pass server messages on to the ClientSession and flag when the server's stdout closes."""
+    try:
+        async with sink:
+            async for message in source:
+                await sink.send(message)
+    except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+        pass  # the ClientSession is shutting down
+    finally:
+        eof.set()
+
+
+class PersistentSession:
+    """
+    One long-lived MCP server subprocess and its initialized ClientSession.
+    stdio_client / ClientSession must be entered and exited by the same task,
+    so a background task owns them and stays parked until close() — or until
+    the server's stdout closes, i.e. the process exited, after which `alive`
+    is False and outstanding requests fail with ServerExited.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.session: Optional[ClientSession] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._exited = asyncio.Event()  # the server's stdout closed
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self.in_flight = 0
+
+    async def start(self) -> "PersistentSession":
+        self._task = asyncio.create_task(self._run())
+        try:
+            await self._ready.wait()
+        except asyncio.CancelledError:
+            # Timed out or abandoned while starting: take the subprocess down with us
+            self._task.cancel()
+            raise
+        if self.session is None:
+            raise RuntimeError(f"MCP server {self.config['script']} failed to start: {self._error}")
+        return self
+
+    async def _run(self):
+        try:
+            async with stdio_client(_server_params(self.config)) as (read, write):
+                relay_send, relay_receive = anyio.create_memory_object_stream(0)
+                relay = asyncio.create_task(_relay(read, relay_send, self._exited))
+                try:
+                    async with ClientSession(relay_receive, write) as session:
+                        await session.initialize()
+                        self.session = session
+                        self._ready.set()
+                        waiters = [asyncio.create_task(self._closing.wait()), asyncio.create_task(self._exited.wait())]
+                        try:
+                            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                        finally:
+                            for waiter in waiters:
+                                waiter.cancel()
+                        if not self._closing.is_set():
+                            self._error = ServerExited(f"MCP server {self.config['script']} exited")
+                            self.session = None
+                finally:
+                    relay.cancel()
+        except Exception as e:
+            self._error = self._error or e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return (self.session is not None and not self._exited.is_set()
+                and self._task is not None and not self._task.done())
+
+    async def _request(self, coro):
+        """Await `coro`, but fail with ServerExited as soon as the server process goes away."""
+        request = asyncio.ensure_future(coro)
+        exited = asyncio.ensure_future(self._exited.wait())
+        try:
+            await asyncio.wait({request, exited}, return_when=asyncio.FIRST_COMPLETED)
+            if request.done():
+                return request.result()
+            raise ServerExited(f"MCP server {self.config['script']} exited")
+        finally:
+            for future in (request, exited):
+                if not future.done():
+                    future.cancel()
+
+    async def list_tools(self):
+        return (await self._request(self.session.list_tools())).tools
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        return await self._request(self.session.call_tool(tool_name, arguments=arguments))
+
+    async def close(self):
+        self._closing.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Wedged server: cancelling the owner task tears down the subprocess
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class ServerPool:
+    """
+    Up to `size` PersistentSessions for one server, started on demand.
+    Calls wait in this server's own queue (at most `max_concurrency` in flight,
+    default `size`), so a slow server never holds up calls to the others.
+    A call that fails because the server process died restarts it and is
+    retried once; errors from a live server are raised and leave it running.
+    After `idle_timeout` seconds without calls the sessions are stopped;
+    the next call cold-starts them again.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        size: int = 1,
+        max_concurrency: Optional[int] = None,
+        idle_timeout: Optional[float] = IDLE_TIMEOUT,
+        call_timeout: Optional[float] = None,
+    ):
+        self.config = config
+        self.size = max(1, size)
+        self.max_concurrency = max(1, max_concurrency or self.size)
+        self.idle_timeout = idle_timeout
+        self.call_timeout = call_timeout
+        self._sessions: List[PersistentSession] = []
+        self._limit = asyncio.Semaphore(self.max_concurrency)
+        self._grow_lock = asyncio.Lock()
+
+        # Health
+        self.state = "cold"  # cold | starting | healthy | restarting | failed (health() also reports crashed)
+        self.last_error: Optional[str] = None
+        self.last_used = time.monotonic()
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+        self.in_flight = 0
+        self.queued = 0
+
+    def _pick(self) -> Optional[PersistentSession]:
+        """Least busy live session, or None if another session should be started."""
+        live = [s for s in self._sessions if s.alive]
+        if not live:
+            return None
+        session = min(live, key=lambda s: s.in_flight)
+        if session.in_flight and len(live) < self.size:
+            return None
+        return session
+
+    async def _session(self) -> PersistentSession:
+        session = self._pick()
+        if session is not None:
+            return session
+        async with self._grow_lock:
+            dead = [s for s in self._sessions if not s.alive]
+            for s in dead:
+                await self._discard(s)
+            session = self._pick()
+            if session is not None:
+                return session
+            print(f"→ Starting MCP server {self.config['script']} ({len(self._sessions) + 1}/{self.size})")
+            if self.state != "restarting":
+                self.state = "starting"
+            try:
+                session = await PersistentSession(self.config).start()
+            except Exception as e:
+                self.state = "failed"
+                self.last_error = str(e) or type(e).__name__
+                raise
+            self._sessions.append(session)
+            self.state = "healthy"
+            return session
+
+    async def _discard(self, session: PersistentSession):
+        if session in self._sessions:
+            self._sessions.remove(session)
+        try:
+            await session.close()
+        except Exception as e:
+            print(f"⚠️ Error stopping MCP server {self.config['script']}: {e}")
+
+    async def _dispatch(self, label: str, fn):
+        """Queue behind this server's concurrency limit, then run fn(session) with one restart on failure."""
+        self.queued += 1
+        try:
+            await self._limit.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            for attempt in (1, 2):
+                session = await self._session()
+                session.in_flight += 1
+                try:
+                    result = await asyncio.wait_for(fn(session), self.call_timeout)
+                    self.calls += 1
+                    self.state = "healthy"
+                    return result
+                except asyncio.TimeoutError:
+                    # The call may have side effects, so it is not retried; the session is replaced next time
+                    self.failures += 1
+                    self.last_error = f"{label} timed out after {self.call_timeout}s"
+                    await self._discard(session)
+                    raise
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e) or type(e).__name__
+                    if session.alive:
+                        raise  # tool or protocol error from a running server
+                    await self._discard(session)
+                    if attempt == 2:
+                        self.state = "failed"
+                        raise
+                    self.restarts += 1
+                    self.state = "restarting"
+                    print(f"⚠️ MCP server {self.config['script']} died during {label} ({self.last_error}); restarting and retrying")
+                finally:
+                    session.in_flight -= 1
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+            self._limit.release()
+
+    async def list_tools(self):
+        return await self._dispatch("list_tools", lambda session: session.list_tools())
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        return await self._dispatch(tool_name, lambda session: session.call_tool(tool_name, arguments))
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+    async def stop_if_idle(self) -> bool:
+        """Stop all sessions if nothing has used this server for idle_timeout seconds."""
+        if not self.idle_timeout or not self._sessions or self.in_flight or self.queued:
+            return False
+        if self.idle_for() < self.idle_timeout:
+            return False
+        async with self._grow_lock:
+            if self.in_flight or self.queued or self.idle_for() < self.idle_timeout:
+                return False
+            sessions, self._sessions = self._sessions, []
+        print(f"→ Stopping idle MCP server {self.config['script']} (idle {self.idle_for():.0f}s)")
+        for session in sessions:
+            await self._discard(session)
+        self.state = "cold"
+        return True
+
+    def health(self) -> Dict[str, Any]:
+        state = self.state
+        if state == "healthy" and not self._sessions:
+            state = "cold"
+        elif state == "healthy" and not any(s.alive for s in self._sessions):
+            state = "crashed"  # exited since the last call; the next call restarts it
+        return {
+            "state": state,
+            "sessions": sum(1 for s in self._sessions if s.alive),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "idle_seconds": round(self.idle_for(), 1),
+        }
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            await self._discard(session)
+        self.state = "cold"
+
+
 class MultiMCP:
     """
-    Stateless version: discovers tools from multiple MCP servers, but reconnects per tool call.
-    Each call_tool() uses a fresh session based on tool-to-server mapping.
+    Discovers tools from multiple MCP servers and keeps each server running
+    for later calls. Every server gets a pool of up to `pool_size` (config key,
+    default 1) long-lived sessions; shutdown() closes them all.
+    Per-server config keys `max_concurrency`, `call_timeout` and `idle_timeout`
+    (default `idle_timeout`) tune each pool; health() reports their state.
+    Discovery runs on all servers at once; a server that fails or takes longer
+    than `discovery_timeout` seconds (config key overrides) is skipped.
+    Discovered tools are saved to `catalog_path` keyed by server fingerprint;
+    servers whose fingerprint matches are not started until a tool is called.
     """
 
-    def __init__(self, server_configs: List[dict]):
+    def __init__(
+        self,
+        server_configs: List[dict],
+        discovery_timeout: float = 30.0,
+        catalog_path: Optional[Path] = TOOL_CATALOG,
+        idle_timeout: Optional[float] = IDLE_TIMEOUT,
+    ):
         self.server_configs = server_configs
+        self.discovery_timeout = discovery_timeout
+        self.idle_timeout = idle_timeout
+        self.catalog_path = Path(catalog_path) if catalog_path else None
         self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
+        self.pools: Dict[str, ServerPool] = {}  # server id → session pool
+        self.failed_servers: Dict[str, str] = {}  # server id → reason discovery failed
+        self._reaper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _server_id(config: dict) -> str:
+        return config.get("id", config["script"])
+
+    def _pool(self, config: dict) -> ServerPool:
+        server_id = self._server_id(config)
+        if server_id not in self.pools:
+            self.pools[server_id] = ServerPool(
+                config,
+                size=config.get("pool_size", 1),
+                max_concurrency=config.get("max_concurrency"),
+                idle_timeout=config.get("idle_timeout", self.idle_timeout),
+                call_timeout=config.get("call_timeout"),
+            )
+        return self.pools[server_id]
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            for pool in list(self.pools.values()):
+                try:
+                    await pool.stop_if_idle()
+                except Exception as e:
+                    print(f"⚠️ Error stopping idle MCP server {pool.config['script']}: {e}")
+
+    async def _discover(self, config: dict) -> List[Any]:
+        print(f"→ Scanning tools from: {config['script']} in {config.get('cwd', os.getcwd())}")
+        timeout = config.get("discovery_timeout", self.discovery_timeout)
+        # The discovery session stays in the pool and serves later calls
+        tools = await asyncio.wait_for(self._pool(config).list_tools(), timeout)
+        print(f"→ Tools received from {config['script']}: {[tool.name for tool in tools]}")
+        return tools
+
+    def _load_catalog(self) -> Dict[str, dict]:
+        if self.catalog_path is None or not self.catalog_path.exists():
+            return {}
+        try:
+            return json.loads(self.catalog_path.read_text())
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Ignoring unreadable tool catalog {self.catalog_path}: {e}")
+            return {}
+
+    def _save_catalog(self, catalog: Dict[str, dict]):
+        if self.catalog_path is None:
+            return
+        self.catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.catalog_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(catalog, indent=2))
+        os.replace(tmp, self.catalog_path)
+
+    def _cached_tools(self, catalog: Dict[str, dict], config: dict, fingerprint: Optional[str]) -> Optional[List[Tool]]:
+        entry = catalog.get(self._server_id(config))
+        if fingerprint is None or entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        try:
+            return [Tool.model_validate(tool) for tool in entry["tools"]]
+        except Exception:
+            return None
 
     async def initialize(self):
         print("in MultiMCP initialize")
+        catalog = self._load_catalog()
+        fingerprints, cached = {}, {}
         for config in self.server_configs:
+            server_id = self._server_id(config)
             try:
-                params = StdioServerParameters(
-                    command=sys.executable,
-                    args=[config["script"]],
-                    cwd=config.get("cwd", os.getcwd())
-                )
-                print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
-                async with stdio_client(params) as (read, write):
-                    print("Connection established, creating session...")
-                    try:
-                        async with ClientSession(read, write) as session:
-                            print("[agent] Session created, initializing...")
-                            await session.initialize()
-                            print("[agent] MCP session initialized")
-                            tools = await session.list_tools()
-                            print(f"→ Tools received: {[tool.name for tool in tools.tools]}")
-                            for tool in tools.tools:
-                                self.tool_map[tool.name] = {
-                                    "config": config,
-                                    "tool": tool
-                                }
-                    except Exception as se:
-                        print(f"❌ Session error: {se}")
-            except Exception as e:
-                print(f"❌ Error initializing MCP server {config['script']}: {e}")
+                fingerprints[server_id] = server_fingerprint(config)
+            except (OSError, SyntaxError) as e:
+                fingerprints[server_id] = None  # can't fingerprint: always discover
+                print(f"⚠️ Cannot fingerprint {config['script']}: {e}")
+            tools = self._cached_tools(catalog, config, fingerprints[server_id])
+            if tools is not None:
+                cached[server_id] = tools
+                print(f"→ Tools for {config['script']} from catalog cache (server starts on first call)")
+
+        to_discover = [c for c in self.server_configs if self._server_id(c) not in cached]
+        discovered = await asyncio.gather(
+            *(self._discover(config) for config in to_discover),
+            return_exceptions=True,
+        )
+        results = dict(cached)
+        results.update({self._server_id(c): r for c, r in zip(to_discover, discovered)})
+
+        # Assemble in config order so a duplicate tool name resolves the same way every run
+        for config in self.server_configs:
+            server_id = self._server_id(config)
+            result = results[server_id]
+            if isinstance(result, BaseException):
+                reason = "timed out" if isinstance(result, asyncio.TimeoutError) else str(result) or type(result).__name__
+                self.failed_servers[server_id] = reason
+                print(f"❌ Skipping MCP server {config['script']}: {reason}")
+                pool = self.pools.pop(server_id, None)
+                if pool is not None:
+                    await pool.close()
+                continue
+            for tool in result:
+                self.tool_map[tool.name] = {
+                    "config": config,
+                    "tool": tool
+                }
+            if server_id not in cached and fingerprints[server_id] is not None:
+                catalog[server_id] = {
+                    "fingerprint": fingerprints[server_id],
+                    "tools": [tool.model_dump(mode="json") for tool in result],
+                }
+        if to_discover:
+            self._save_catalog(catalog)
+        print(f"→ {len(self.tool_map)} tools ready from {len(self.server_configs) - len(self.failed_servers)}"
+              f"/{len(self.server_configs)} servers")
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
 
     async def call_tool(self, tool_name: str, arguments: dict) -> Any:
         entry = self.tool_map.get(tool_name)
         if not entry:
             raise ValueError(f"Tool '{tool_name}' not found on any server.")
-
-        config = entry["config"]
-        params = StdioServerParameters(
-            command=sys.executable,
-            args=[config["script"]],
-            cwd=config.get("cwd", os.getcwd())
-        )
-
-        async with stdio_client(params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                return await session.call_tool(tool_name, arguments)
+        return await self._pool(entry["config"]).call_tool(tool_name, arguments)
 
     async def list_all_tools(self) -> List[str]:
         return list(self.tool_map.keys())
@@ -109,5 +534,30 @@ class MultiMCP:
     def get_all_tools(self) -> List[Any]:
         return [entry["tool"] for entry in self.tool_map.values()]
 
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """Per-server status: pool health for known servers, the failure reason for skipped ones."""
+        report = {}
+        for config in self.server_configs:
+            server_id = self._server_id(config)
+            if server_id in self.failed_servers:
+                report[server_id] = {"state": "unavailable", "last_error": self.failed_servers[server_id]}
+            elif server_id in self.pools:
+                report[server_id] = self.pools[server_id].health()
+            else:
+                report[server_id] = {"state": "cold"}
+        return report
+
     async def shutdown(self):
-        pass  # no persistent sessions to close
\ No newline at end of file
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        pools, self.pools = self.pools, {}
+        for server_id, pool in pools.items():
+            try:
+                await pool.close()
+            except Exception as e:
+                print(f"⚠️ Error closing MCP server {server_id}: {e}")
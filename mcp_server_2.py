@@ -13,6 +13,16 @@ from pathlib import Path
 import requests
 from markitdown import MarkItDown
 import time
+from modules.mcp_log import mcp_log
+from modules.embedding_cache import get_default_cache
+from modules.chunk_store import ChunkStore
+from modules.index_wal import IndexWAL
+from modules.sharded_index import MANIFEST_FILE, ShardedIndex
+from modules.query_cache import QueryCache
+from modules.background_indexer import BackgroundIndexer
+from modules.ollama_client import get_default_client
+from modules.embedders import Embedder, OllamaEmbedder, create_embedder
+from modules.caption_cache import get_default_cache as get_caption_cache, image_hash
 from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput
 from tqdm import tqdm
 import hashlib
@@ -20,39 +30,168 @@ from pydantic import BaseModel
 import subprocess
 import sqlite3
 import trafilatura
+import pymupdf
 import pymupdf4llm
 import re
 import base64 # ollama needs base64-encoded-image
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
 
 mcp = FastMCP("Calculator")
 
 EMBED_URL = "http://localhost:11434/api/embeddings"
+EMBED_BATCH_URL = "http://localhost:11434/api/embed"  # multi-input endpoint
 OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
 OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_CONNECT_TIMEOUT = 5  # seconds to open a connection to Ollama
+OLLAMA_READ_TIMEOUT = 300  # seconds to wait for a response (captioning / phi4 can be slow)
+OLLAMA_RETRIES = 3  # retries on connection errors, timeouts and 429/5xx, with exponential backoff
+OLLAMA_RETRY_BACKOFF = 0.5  # seconds before the first retry; doubles each time
+OLLAMA_POOL_SIZE = 16  # keep-alive connections; covers EMBED_MAX_IN_FLIGHT + CAPTION_MAX_IN_FLIGHT
 EMBED_MODEL = "nomic-embed-text"
 GEMMA_MODEL = "gemma3:12b"
 PHI_MODEL = "phi4:latest"
 CHUNK_SIZE = 256
 CHUNK_OVERLAP = 40
 MAX_CHUNK_LENGTH = 512  # characters
+CHUNKING_MODE = "llm"  # "llm" (phi4 semantic_merge) or "embedding" (sentence-similarity breakpoints)
+EMBED_CHUNK_WINDOW = 3  # sentences averaged on the left side of a candidate boundary
+EMBED_CHUNK_BREAKPOINT_PERCENTILE = 20  # lowest-similarity percent of gaps that become boundaries
 TOP_K = 3  # FAISS top-K matches
+SEARCH_K = 5  # results returned by search_documents
+SEARCH_MODE = "hybrid"  # "hybrid" (BM25 + vector, fused), "vector" or "lexical"
+HYBRID_CANDIDATES = 20  # candidates taken from each retriever before fusion
+RRF_K = 60  # reciprocal rank fusion damping constant
+QUERY_CACHE_SIZE = 1024  # search results kept per index version (LRU)
+QUERY_CACHE_TTL = 600  # seconds a cached search result stays valid; None disables expiry
+# "embed" (batched /api/embed), "embeddings" (one text per /api/embeddings call), or a
+# config/models.json embedding key run in-process: "nomic" (local model) or "hashing" (tests).
+# Backends produce different vectors (/api/embed normalises, /api/embeddings doesn't), so
+# changing this re-indexes every document on the next process_documents. The default
+# matches faiss_index/index.bin, which ships built from /api/embeddings; it sends one
+# request per text (EMBED_MAX_IN_FLIGHT batches still overlap). Set "embed" for true
+# multi-input batching once a one-time full re-embed is acceptable.
+EMBED_BACKEND = "embeddings"
+EMBED_BATCH_SIZE = 32  # chunks per embedding request
+EMBED_MAX_IN_FLIGHT = 4  # concurrent embedding requests during indexing
+CAPTION_MAX_IN_FLIGHT = 4  # concurrent image captioning requests per document
+PDF_STREAM_PAGES = 8  # PDFs longer than this are extracted in page batches of this size on the worker pool; 0 disables
+HASH_WORKERS = 8  # threads hashing changed files at startup (hashlib releases the GIL)
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # processes parsing documents in parallel
+# Workers never fork this (multi-threaded) process; Windows only has spawn
+EXTRACT_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+INDEX_KIND = "auto"  # "auto" (by vector count), "flat", "ivf_flat", "hnsw" or "ivf_pq"
+VECTOR_ENCODING = "float32"  # "float32", "fp16", "sq8" (int8) or "pq"; changing it migrates on the next process_documents
+RERANK_EXACT = True  # re-score compressed-index candidates with the exact float32 vectors from the chunk store
+RERANK_FACTOR = 4  # candidates fetched per requested result before exact re-ranking
+WATCH_POLL_INTERVAL = 2.0  # seconds between scans of documents/ by the background indexer
+WATCH_DEBOUNCE = 3.0  # seconds documents/ must stay unchanged before a re-index starts
+CHECKPOINT_EVERY = 10  # files indexed between shard checkpoints; changes in between live in the shard WALs
+INDEX_SHARDS = 4  # document-hash shards searched in parallel; changing it reshards on the next process_documents
 ROOT = Path(__file__).parent.resolve()
+INDEX_DIR = ROOT / "faiss_index"
+SHARD_DIR = INDEX_DIR / "shards"
+LEGACY_INDEX_FILE = INDEX_DIR / "index.bin"  # single pre-sharding index, read (not moved) on the first sharded run
+LEGACY_INDEX_WAL = INDEX_DIR / "index.wal"
+CHUNKS_DB = INDEX_DIR / "chunks.db"
+METADATA_FILE = INDEX_DIR / "metadata.json"  # legacy chunk list, migrated into CHUNKS_DB
+
+# Index kept resident for the lifetime of the server process and reloaded only
+# when process_documents has checkpointed or logged changes. Chunk text is read
+# from the chunk store per query, a handful of rows at a time.
+_resident = {"index": None}
+_resident_lock = threading.Lock()
+_chunk_store = None
+_query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+_indexer = None
+_embedder = None
+
+
+def ollama():
+    """Shared keep-alive client for every Ollama call in this process."""
+    return get_default_client(
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=OLLAMA_READ_TIMEOUT,
+        retries=OLLAMA_RETRIES,
+        backoff=OLLAMA_RETRY_BACKOFF,
+        pool_size=OLLAMA_POOL_SIZE,
+    )
 
+def get_embedder() -> Embedder:
+    """The process-wide embedder for EMBED_BACKEND, built on first use (a local model loads once)."""
+    global _embedder
+    with _resident_lock:
+        if _embedder is None:
+            if EMBED_BACKEND == "embed":
+                _embedder = OllamaEmbedder(EMBED_MODEL, EMBED_BATCH_URL, batched=True, client=ollama())
+            elif EMBED_BACKEND == "embeddings":
+                _embedder = OllamaEmbedder(EMBED_MODEL, EMBED_URL, batched=False, client=ollama())
+            else:
+                _embedder = create_embedder(EMBED_BACKEND)
+        return _embedder
+
+def get_embeddings(texts: list[str], query: bool = False) -> np.ndarray:
+    """Embed stored texts, or search queries with query=True (some models prefix them differently)."""
+    embedder = get_embedder()
+    embed_fn = embedder.embed_queries if query else embedder.embed
+    if not embedder.cacheable:
+        return embed_fn(texts)
+    # Cache key is the embedder name: different backends produce different vectors
+    return get_default_cache().embed(embedder.query_name if query else embedder.name, texts, embed_fn)
 
 def get_embedding(text: str) -> np.ndarray:
-    response = requests.post(EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
-    response.raise_for_status()
-    return np.array(response.json()["embedding"], dtype=np.float32)
+    return get_embeddings([text])[0]
+
+def embed_batches(texts: list[str], batch_size: int = EMBED_BATCH_SIZE, max_in_flight: int = EMBED_MAX_IN_FLIGHT):
+    """Yield embeddings for `texts` one batch at a time, in input order,
+    keeping at most `max_in_flight` requests outstanding."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = deque()
+        for batch in batches:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(pool.submit(get_embeddings, batch))
+        while pending:
+            yield pending.popleft().result()
 
 def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     words = text.split()
     for i in range(0, len(words), size - overlap):
         yield " ".join(words[i:i+size])
 
-def mcp_log(level: str, message: str) -> None:
-    sys.stderr.write(f"{level}: {message}\n")
-    sys.stderr.flush()
+def get_chunk_store() -> ChunkStore:
+    """Open the chunk store once per process, migrating a legacy metadata.json on first use."""
+    global _chunk_store
+    with _resident_lock:
+        if _chunk_store is None:
+            store = ChunkStore(CHUNKS_DB)
+            if METADATA_FILE.exists() and store.count() == 0 and not store.get_meta("migrated_json"):
+                index = faiss.read_index(str(LEGACY_INDEX_FILE)) if LEGACY_INDEX_FILE.exists() else None
+                migrated = store.migrate_from_json(METADATA_FILE, index)
+                mcp_log("INFO", f"Migrated {migrated} chunks from metadata.json into {CHUNKS_DB.name}")
+            _chunk_store = store
+        return _chunk_store
+
+def get_resident_index() -> ShardedIndex:
+    """Return the resident sharded index, reloading only the shards whose files changed on disk."""
+    store = get_chunk_store()
+    with _resident_lock:
+        if _resident["index"] is None:
+            _resident["index"] = ShardedIndex(SHARD_DIR, store, INDEX_SHARDS, INDEX_KIND, VECTOR_ENCODING)
+    sharded = _resident["index"]
+    if sharded.refresh():
+        mcp_log("INFO", f"Loaded FAISS shards into memory ({sharded.ntotal} vectors)")
+    return sharded
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
 
 # === CHUNKING ===
 
@@ -83,104 +222,249 @@ Just respond in one word (Yes or No), and do not provide any further explanation
     print(f"  Chunk {index} → {chunk1[:60]}{'...' if len(chunk1) > 60 else ''}")
     print(f"  Chunk {index+1} → {chunk2[:60]}{'...' if len(chunk2) > 60 else ''}")
 
-    response = requests.post(OLLAMA_CHAT_URL, json={
+    result = ollama().post_json(OLLAMA_CHAT_URL, {
         "model": PHI_MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "stream": False
     })
-    response.raise_for_status()
-    reply = response.json().get("message", {}).get("content", "").strip().lower()
+    reply = result.get("message", {}).get("content", "").strip().lower()
     print(f"  ✅ Model reply: {reply}")
     return reply.startswith("yes")
 
 
 
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = RRF_K) -> list[int]:
+    """Fuse several best-first id rankings: score(id) = sum 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def search_chunks(query: str, k: int = SEARCH_K, mode: str = SEARCH_MODE) -> list[dict]:
+    """
+    Return the top-k chunk rows ({"id", "doc", "chunk", "chunk_id"}) for `query`.
+    "hybrid" fuses FAISS and BM25 candidate lists with reciprocal rank fusion,
+    so exact terms (invoice numbers, names, amounts) surface even when the
+    embedding misses them.
+    """
+    return search_chunks_batch([query], k=k, mode=mode)[0]
+
+
+def search_chunks_batch(queries: list[str], k: int = SEARCH_K, mode: str = SEARCH_MODE) -> list[list[dict]]:
+    """
+    search_chunks for many queries at once: batched embedding requests, one
+    multi-row search fanned out across the shards and one chunk store read
+    for all of them. Queries already answered at the current index version
+    come from the query cache without embedding or searching.
+    """
+    if mode not in ("hybrid", "vector", "lexical"):
+        raise ValueError(f"Unknown search mode '{mode}'. Expected 'hybrid', 'vector' or 'lexical'")
+    if not queries:
+        return []
+    # Refreshing the shards moves the version whenever process_documents logs new vectors
+    sharded = get_resident_index()
+    version = sharded.version
+    results = [_query_cache.get(query, k, mode, version) for query in queries]
+    missing = [i for i, hits in enumerate(results) if hits is None]
+    if missing:
+        fresh = _search_uncached(sharded, [queries[i] for i in missing], k, mode)
+        for i, hits in zip(missing, fresh):
+            results[i] = hits
+            _query_cache.put(queries[i], k, mode, version, hits)
+    return results
+
+
+def _search_uncached(sharded: ShardedIndex, queries: list[str], k: int, mode: str) -> list[list[dict]]:
+    store = get_chunk_store()
+    candidates = k if mode == "vector" else max(k, HYBRID_CANDIDATES)
+
+    rankings = [[] for _ in queries]
+    if mode in ("hybrid", "vector"):
+        if sharded.ntotal:
+            query_vecs = get_embeddings(queries, query=True)
+            rerank = RERANK_EXACT and sharded.encodings() != {"float32"}
+            D, I = sharded.search(query_vecs, candidates * RERANK_FACTOR if rerank else candidates)
+            if rerank:
+                I = _rerank_exact(store, query_vecs, I, candidates)
+            for per_query, row in zip(rankings, I):
+                per_query.append([int(i) for i in row if i >= 0])
+    if mode in ("hybrid", "lexical"):
+        for per_query, query in zip(rankings, queries):
+            per_query.append([chunk_id for chunk_id, _ in store.search_text(query, candidates)])
+
+    ranked = [r[0] if len(r) == 1 else reciprocal_rank_fusion(r) for r in rankings]
+    rows = store.get_many({i for r in ranked for i in r})
+    return [[dict(rows[i], id=i) for i in r if i in rows][:k] for r in ranked]
+
+
+def _rerank_exact(store: ChunkStore, query_vecs: np.ndarray, I: np.ndarray, keep: int) -> list[list[int]]:
+    """Re-order approximate candidates by exact L2 distance to the stored float32 vectors."""
+    exact = store.get_vectors({int(i) for row in I for i in row if i >= 0})
+    reranked = []
+    for query_vec, row in zip(query_vecs, I):
+        ids = [int(i) for i in row if i in exact]
+        if not ids:
+            reranked.append([])
+            continue
+        dists = ((np.stack([exact[i] for i in ids]) - query_vec) ** 2).sum(axis=1)
+        reranked.append([ids[j] for j in np.argsort(dists)[:keep]])
+    return reranked
+
+
+def _format_hit(hit: dict) -> str:
+    return f"{hit['chunk']}\n[Source: {hit['doc']}, ID: {hit['chunk_id']}]"
+
+
 @mcp.tool()
 def search_documents(query: str) -> list[str]:
     """Search indexed documents for relevant content. Usage: search_documents|query="india Current GDP" """
     ensure_faiss_ready()
     mcp_log("SEARCH", f"Query: {query}")
     try:
-        index = faiss.read_index(str(ROOT / "faiss_index" / "index.bin"))
-        metadata = json.loads((ROOT / "faiss_index" / "metadata.json").read_text())
-        query_vec = get_embedding(query).reshape(1, -1)
-        D, I = index.search(query_vec, k=5)
-        results = []
-        for idx in I[0]:
-            data = metadata[idx]
-            results.append(f"{data['chunk']}\n[Source: {data['doc']}, ID: {data['chunk_id']}]")
-        return results
+        hits = search_chunks(query)
+        if not hits and get_chunk_store().count() == 0:
+            return ["ERROR: Document index is not available yet; indexing is running in the background (see index_status)."]
+        return [_format_hit(hit) for hit in hits]
     except Exception as e:
         return [f"ERROR: Failed to search: {str(e)}"]
 
 
-def caption_image(img_url_or_path: str) -> str:
-    mcp_log("CAPTION", f"🖼️ Attempting to caption image: {img_url_or_path}")
+@mcp.tool()
+def search_documents_batch(queries: list[str]) -> list[list[str]]:
+    """Search indexed documents for several queries in one call; one result list per query. Usage: search_documents_batch|queries=["Gensol promoters", "Go-Auto directors"]"""
+    ensure_faiss_ready()
+    mcp_log("SEARCH", f"Batch of {len(queries)} queries")
+    try:
+        return [[_format_hit(hit) for hit in hits] for hits in search_chunks_batch(queries)]
+    except Exception as e:
+        return [[f"ERROR: Failed to search: {str(e)}"] for _ in queries]
 
-    full_path = Path(__file__).parent / "documents" / img_url_or_path
-    full_path = full_path.resolve()
 
+@mcp.tool()
+def search_cache_stats() -> dict:
+    """Hit/miss counters and size of the search result cache. Usage: search_cache_stats"""
+    return _query_cache.stats()
+
+
+def _load_image_bytes(img_url_or_path: str) -> bytes:
+    if img_url_or_path.startswith("http"): # for extract_web_pages
+        response = requests.get(img_url_or_path)
+        response.raise_for_status()
+        return response.content
+
+    full_path = (Path(__file__).parent / "documents" / img_url_or_path).resolve()
     if not full_path.exists():
-        mcp_log("ERROR", f"❌ Image file not found: {full_path}")
-        return f"[Image file not found: {img_url_or_path}]"
+        raise FileNotFoundError(str(full_path))
+    return full_path.read_bytes()
+
+
+def _request_caption(image_bytes: bytes) -> str:
+    encoded_image = base64.b64encode(image_bytes).decode("utf-8")
+
+    # Set stream=True to get the full generator-style output
+    caption_parts = []
+    for data in ollama().stream_json(OLLAMA_URL, {
+        "model": GEMMA_MODEL,
+        "prompt": "If there is lot of text in the image, then ONLY reply back with exact text in the image, else Describe the image such that your response can replace 'alt-text' for it. Only explain the contents of the image and provide no further explaination.",
+        "images": [encoded_image],
+        "stream": True
+    }):
+        caption_parts.append(data.get("response", ""))
+        if data.get("done", False):
+            break
+
+    return "".join(caption_parts).strip()
+
+
+def _caption_cached(image_bytes: bytes, label: str) -> str:
+    """Caption image bytes, reusing the cached caption for identical content."""
+    key = image_hash(image_bytes)
+    cached = get_caption_cache().get(GEMMA_MODEL, key)
+    if cached is not None:
+        mcp_log("CAPTION", f"♻️ Cached caption for {label}")
+        return cached
 
     try:
-        if img_url_or_path.startswith("http"): # for extract_web_pages
-            response = requests.get(img_url_or_path)
-            encoded_image = base64.b64encode(response.content).decode("utf-8")
-        else:
-            with open(full_path, "rb") as img_file:
-                encoded_image = base64.b64encode(img_file.read()).decode("utf-8")
-
-        # Set stream=True to get the full generator-style output
-        with requests.post(OLLAMA_URL, json={
-            "model": GEMMA_MODEL,
-            "prompt": "If there is lot of text in the image, then ONLY reply back with exact text in the image, else Describe the image such that your response can replace 'alt-text' for it. Only explain the contents of the image and provide no further explaination.",
-            "images": [encoded_image],
-            "stream": True
-        }, stream=True) as response:
-
-            caption_parts = []
-            for line in response.iter_lines():
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line)
-                    caption_parts.append(data.get("response", ""))
-                    if data.get("done", False):
-                        break
-                except json.JSONDecodeError:
-                    continue  # silently skip malformed lines
-
-            caption = "".join(caption_parts).strip()
-            mcp_log("CAPTION", f"✅ Caption generated: {caption}")
-            return caption if caption else "[No caption returned]"
+        caption = _request_caption(image_bytes)
+    except Exception as e:
+        mcp_log("ERROR", f"⚠️ Failed to caption image {label}: {e}")
+        return f"[Image could not be processed: {label}]"
+
+    mcp_log("CAPTION", f"✅ Caption generated: {caption}")
+    if not caption:
+        return "[No caption returned]"
+    get_caption_cache().put(GEMMA_MODEL, key, caption)
+    return caption
 
+
+def caption_image(img_url_or_path: str) -> str:
+    mcp_log("CAPTION", f"🖼️ Attempting to caption image: {img_url_or_path}")
+    try:
+        image_bytes = _load_image_bytes(img_url_or_path)
+    except FileNotFoundError as e:
+        mcp_log("ERROR", f"❌ Image file not found: {e}")
+        return f"[Image file not found: {img_url_or_path}]"
     except Exception as e:
-        mcp_log("ERROR", f"⚠️ Failed to caption image {img_url_or_path}: {e}")
+        mcp_log("ERROR", f"⚠️ Failed to load image {img_url_or_path}: {e}")
         return f"[Image could not be processed: {img_url_or_path}]"
+    return _caption_cached(image_bytes, img_url_or_path)
 
 
 
 
 
-def replace_images_with_captions(markdown: str) -> str:
-    def replace(match):
-        alt, src = match.group(1), match.group(2)
+IMAGE_LINK = re.compile(r'!\[(.*?)\]\((.*?)\)')
+
+
+def replace_images_with_captions(markdown: str, max_in_flight: int = CAPTION_MAX_IN_FLIGHT) -> str:
+    """
+    Replace every markdown image with its caption. Distinct images are captioned
+    concurrently (at most `max_in_flight` at once), identical images only once,
+    and captions are spliced back in document order.
+    """
+    srcs = list(dict.fromkeys(match.group(2) for match in IMAGE_LINK.finditer(markdown)))
+    if not srcs:
+        return markdown
+
+    captions = {}
+    by_hash = {}  # content hash → (bytes, [srcs])
+    for src in srcs:
+        try:
+            image_bytes = _load_image_bytes(src)
+        except FileNotFoundError:
+            mcp_log("ERROR", f"❌ Image file not found: {src}")
+            captions[src] = f"[Image file not found: {src}]"
+            continue
+        except Exception as e:
+            mcp_log("ERROR", f"⚠️ Failed to load image {src}: {e}")
+            captions[src] = f"[Image could not be processed: {src}]"
+            continue
+        by_hash.setdefault(image_hash(image_bytes), (image_bytes, []))[1].append(src)
+
+    mcp_log("CAPTION", f"🖼️ Captioning {len(by_hash)} distinct images ({len(srcs)} links)")
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        futures = {pool.submit(_caption_cached, image_bytes, group[0]): group
+                   for image_bytes, group in by_hash.values()}
+        for future, group in futures.items():
+            caption = future.result()
+            for src in group:
+                captions[src] = caption
+
+    # Attempt to delete only if local and file exists
+    for src in srcs:
+        if src.startswith("http"):
+            continue
+        img_path = Path(__file__).parent / "documents" / src
         try:
-            caption = caption_image(src)
-            # Attempt to delete only if local and file exists
-            if not src.startswith("http"):
-                img_path = Path(__file__).parent / "documents" / src
-                if img_path.exists():
-                    img_path.unlink()
-                    mcp_log("INFO", f"🗑️ Deleted image after captioning: {img_path}")
-            return f"**Image:** {caption}"
+            if img_path.exists():
+                img_path.unlink()
+                mcp_log("INFO", f"🗑️ Deleted image after captioning: {img_path}")
         except Exception as e:
             mcp_log("WARN", f"Image deletion failed: {e}")
-            return f"[Image could not be processed: {src}]"
 
-    return re.sub(r'!\[(.*?)\]\((.*?)\)', replace, markdown)
+    return IMAGE_LINK.sub(lambda match: f"**Image:** {captions[match.group(2)]}", markdown)
 
 
 @mcp.tool()
@@ -209,13 +493,18 @@ def extract_pdf(input: FilePathInput) -> MarkdownOutput:
     if not os.path.exists(input.file_path):
         return MarkdownOutput(markdown=f"File not found: {input.file_path}")
 
-    ROOT = Path(__file__).parent.resolve()
+    return MarkdownOutput(markdown=_pdf_to_markdown(input.file_path))
+
+
+def _pdf_to_markdown(doc, pages: list[int] | None = None) -> str:
+    """Markdown for `pages` of a PDF path or open document (all pages if None), images captioned."""
     global_image_dir = ROOT / "documents" / "images"
     global_image_dir.mkdir(parents=True, exist_ok=True)
 
     # Actual markdown with relative image paths
     markdown = pymupdf4llm.to_markdown(
-        input.file_path,
+        doc,
+        pages=pages,
         write_images=True,
         image_path=str(global_image_dir)
     )
@@ -227,8 +516,38 @@ def extract_pdf(input: FilePathInput) -> MarkdownOutput:
         markdown.replace("\\", "/")
     )
 
-    markdown = replace_images_with_captions(markdown)
-    return MarkdownOutput(markdown=markdown)
+    return replace_images_with_captions(markdown)
+
+
+def _page_ranges(page_count: int, pages_per_batch: int = PDF_STREAM_PAGES):
+    return [(start, min(start + pages_per_batch, page_count)) for start in range(0, page_count, pages_per_batch)]
+
+
+def iter_pdf_markdown(path, pages_per_batch: int = PDF_STREAM_PAGES):
+    """
+    Yield (start, end, page_count, markdown) for consecutive page ranges of a
+    PDF. Only one batch of markdown and images is held at a time.
+    """
+    with pymupdf.open(str(path)) as doc:
+        for start, end in _page_ranges(doc.page_count, pages_per_batch):
+            yield start, end, doc.page_count, _pdf_to_markdown(doc, list(range(start, end)))
+
+
+def pdf_batch_markdown(path: str, start: int, end: int) -> str:
+    """Markdown for pages [start, end) of a PDF. Runs inside extraction worker processes."""
+    with pymupdf.open(path) as doc:
+        return _pdf_to_markdown(doc, list(range(start, end)))
+
+
+def _stream_page_count(path: Path) -> int:
+    """Page count if process_documents should index this PDF page batch by page batch, else 0."""
+    if not PDF_STREAM_PAGES or path.suffix.lower() != ".pdf":
+        return 0
+    try:
+        with pymupdf.open(str(path)) as doc:
+            return doc.page_count if doc.page_count > PDF_STREAM_PAGES else 0
+    except Exception:
+        return 0  # let the regular extraction path report the error
 
 
 def semantic_merge(text: str) -> list[str]:
@@ -260,12 +579,12 @@ Keep markdown formatting intact.
 """
 
         try:
-            response = requests.post(OLLAMA_CHAT_URL, json={
+            result = ollama().post_json(OLLAMA_CHAT_URL, {
                 "model": PHI_MODEL,
                 "messages": [{"role": "user", "content": prompt}],
                 "stream": False
             })
-            reply = response.json().get("message", {}).get("content", "").strip()
+            reply = result.get("message", {}).get("content", "").strip()
 
             if reply:
                 # If LLM returned second part, separate it
@@ -296,105 +615,470 @@ Keep markdown formatting intact.
     return final_chunks
 
 
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n\s*\n|\n(?=#)')
+
+
+def _split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+
+def _cap_length(sentence: str, max_chars: int) -> list[str]:
+    """Split a single over-long sentence on word boundaries."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    pieces, current = [], []
+    for word in sentence.split():
+        if current and len(" ".join(current + [word])) > max_chars:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def embedding_chunk(
+    text: str,
+    max_chars: int = MAX_CHUNK_LENGTH,
+    overlap_words: int = CHUNK_OVERLAP,
+    window: int = EMBED_CHUNK_WINDOW,
+    breakpoint_percentile: float = EMBED_CHUNK_BREAKPOINT_PERCENTILE,
+) -> list[str]:
+    """
+    Split text at topic shifts found from sentence-embedding similarity.
+
+    Sentences are embedded in batches; a boundary is placed before sentence i
+    when its cosine similarity to the mean of the previous `window` sentences
+    falls in the lowest `breakpoint_percentile` percent. Chunks never exceed
+    `max_chars`; when a chunk is cut for length (not topic), the next one
+    repeats its last `overlap_words` words.
+    """
+    sentences = [piece for s in _split_sentences(text) for piece in _cap_length(s, max_chars)]
+    if len(sentences) <= 1:
+        return sentences
+
+    vectors = np.concatenate(list(embed_batches(sentences)))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+
+    # Similarity of each sentence to the rolling mean of the `window` before it
+    cumsum = np.cumsum(vectors, axis=0)
+    starts = np.maximum(np.arange(1, len(vectors)) - window, 0)
+    prev_sum = cumsum[:-1] - np.where(starts[:, None] > 0, cumsum[starts - 1], 0)
+    prev_mean = prev_sum / np.linalg.norm(prev_sum, axis=1, keepdims=True).clip(1e-12)
+    similarity = np.einsum("ij,ij->i", prev_mean, vectors[1:])
+    threshold = np.percentile(similarity, breakpoint_percentile)
+    is_boundary = np.concatenate([[False], similarity < threshold])
+
+    chunks, current = [], []
+    for sentence, boundary in zip(sentences, is_boundary):
+        if current and boundary:
+            chunks.append(" ".join(current))
+            current = []
+        elif current and len(" ".join(current + [sentence])) > max_chars:
+            chunks.append(" ".join(current))
+            tail = " ".join(chunks[-1].split()[-overlap_words:]) if overlap_words else ""
+            current = [tail] if tail and len(tail) + len(sentence) < max_chars else []
+        current.append(sentence)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
 
+def chunk_markdown(markdown: str, mode: str = CHUNKING_MODE) -> list[str]:
+    """Chunk extracted markdown with the configured segmenter ("llm" or "embedding")."""
+    if mode == "embedding":
+        return embedding_chunk(markdown)
+    if mode == "llm":
+        return semantic_merge(markdown)
+    raise ValueError(f"Unknown chunking mode '{mode}'. Expected 'llm' or 'embedding'")
 
 
 
 
-def process_documents():
-    """Process documents and create FAISS index using unified multimodal strategy."""
+
+
+
+def extract_markdown(path: str) -> str:
+    """Convert one document to markdown. Runs inside extraction worker processes."""
+    file = Path(path)
+    ext = file.suffix.lower()
+
+    if ext == ".pdf":
+        mcp_log("INFO", f"Using MuPDF4LLM to extract {file.name}")
+        return extract_pdf(FilePathInput(file_path=str(file))).markdown
+
+    elif ext in [".html", ".htm", ".url"]:
+        mcp_log("INFO", f"Using Trafilatura to extract {file.name}")
+        return extract_webpage(UrlInput(url=file.read_text().strip())).markdown
+
+    else:
+        # Fallback to MarkItDown for other formats
+        converter = MarkItDown()
+        mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
+        return converter.convert(str(file)).text_content
+
+
+def _extraction_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(EXTRACT_START_METHOD))
+
+
+def _result_or_alone(future, fn, *args):
+    """
+    `future`'s result. If its pool broke (some worker crashed, e.g. a MuPDF
+    segfault), run the call again in a worker of its own, so only the file
+    that actually crashes fails.
+    """
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        with _extraction_pool(1) as pool:
+            return pool.submit(fn, *args).result()
+
+
+def _batch_results(file: Path, batches):
+    """Yield (start, end, page_count, markdown) for a PDF's page batch futures, in page order."""
+    page_count = batches[-1][1]
+    for start, end, future in batches:
+        yield start, end, page_count, _result_or_alone(future, pdf_batch_markdown, str(file), start, end)
+
+
+def _extract_in_parallel(pending, workers: int, page_counts: dict | None = None):
+    """
+    Extract (file, hash) pairs on a process pool and yield
+    (file, hash, markdown, error) as each file finishes, so chunking and
+    embedding of early files overlap with parsing of later ones. A failure,
+    including a worker crash, only affects its own file.
+    Files in `page_counts` (long PDFs) are split into PDF_STREAM_PAGES page
+    batches on the same pool; for those `markdown` is an iterator of
+    (start, end, page_count, markdown) in page order, ready once the first
+    batch is.
+    """
+    page_counts = page_counts or {}
+    if workers <= 1 or (len(pending) <= 1 and not page_counts):
+        for file, fhash in pending:
+            if file in page_counts:
+                yield file, fhash, iter_pdf_markdown(file), None
+                continue
+            try:
+                yield file, fhash, extract_markdown(str(file)), None
+            except Exception as e:
+                yield file, fhash, None, e
+        return
+
+    n_jobs = sum(len(_page_ranges(page_counts[file])) if file in page_counts else 1 for file, _ in pending)
+    with _extraction_pool(min(workers, n_jobs)) as pool:
+        futures = {}
+        for file, fhash in pending:
+            if file in page_counts:
+                batches = [(start, end, pool.submit(pdf_batch_markdown, str(file), start, end))
+                           for start, end in _page_ranges(page_counts[file])]
+                futures[batches[0][2]] = (file, fhash, batches)
+            else:
+                futures[pool.submit(extract_markdown, str(file))] = (file, fhash, None)
+        for future in as_completed(futures):
+            file, fhash, batches = futures[future]
+            if batches is not None:
+                yield file, fhash, _batch_results(file, batches), None
+                continue
+            try:
+                markdown, error = _result_or_alone(future, extract_markdown, str(file)), None
+            except Exception as e:  # BrokenProcessPool here means this file crashed its own worker
+                markdown, error = None, e
+            yield file, fhash, markdown, error
+
+
+def process_documents(workers: int = EXTRACT_WORKERS, progress=None):
+    """
+    Process documents and create FAISS index using unified multimodal strategy.
+    `progress(done, total, current)` is called as files are indexed.
+    """
     mcp_log("INFO", "Indexing documents with unified RAG pipeline...")
-    ROOT = Path(__file__).parent.resolve()
     DOC_PATH = ROOT / "documents"
-    INDEX_CACHE = ROOT / "faiss_index"
-    INDEX_CACHE.mkdir(exist_ok=True)
-    INDEX_FILE = INDEX_CACHE / "index.bin"
-    METADATA_FILE = INDEX_CACHE / "metadata.json"
-    CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
-
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
+    INDEX_DIR.mkdir(exist_ok=True)
+    CACHE_FILE = INDEX_DIR / "doc_index_cache.json"
+    STAT_FILE = INDEX_DIR / "doc_stat_manifest.json"  # name → [size, mtime_ns, inode, md5]
 
     CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
+    store = get_chunk_store()
+    sharded = ShardedIndex(SHARD_DIR, store, INDEX_SHARDS, INDEX_KIND, VECTOR_ENCODING)
 
-    for file in DOC_PATH.glob("*.*"):
-        fhash = file_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
-            mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
-            continue
+    def save_cache_meta():
+        _atomic_write_text(CACHE_FILE, json.dumps(CACHE_META, indent=2))
 
-        mcp_log("PROC", f"Processing: {file.name}")
-        try:
-            ext = file.suffix.lower()
-            markdown = ""
+    def checkpoint():
+        # Changed shards and the hash cache first (atomic renames), then empty their WALs.
+        # A crash in between just replays records the checkpoint already holds.
+        written = sharded.checkpoint(save_cache_meta)
+        mcp_log("SAVE", f"Checkpointed {written}/{INDEX_SHARDS} FAISS shards ({sharded.ntotal} vectors)")
 
-            if ext == ".pdf":
-                mcp_log("INFO", f"Using MuPDF4LLM to extract {file.name}")
-                markdown = extract_pdf(FilePathInput(file_path=str(file))).markdown
+    if _retire_legacy_index(store, CACHE_META):
+        save_cache_meta()
 
-            elif ext in [".html", ".htm", ".url"]:
-                mcp_log("INFO", f"Using Trafilatura to extract {file.name}")
-                markdown = extract_webpage(UrlInput(url=file.read_text().strip())).markdown
+    if _reset_if_embedder_changed(store, CACHE_META):
+        save_cache_meta()
 
-            else:
-                # Fallback to MarkItDown for other formats
-                converter = MarkItDown()
-                mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
-                markdown = converter.convert(str(file)).text_content
+    # Last checkpoint of every shard + everything logged after it
+    sharded.load(CACHE_META, writer=True)
+
+    # Files that disappeared from documents/ lose their vectors and chunks (including
+    # rows left by a streamed PDF whose indexing never finished)
+    present = {file.name for file in DOC_PATH.glob("*.*")}
+    for name in sorted((set(CACHE_META) | set(store.docs())) - present):
+        sharded.delete_doc(name, store.delete_doc(name))
+        CACHE_META.pop(name, None)
+        mcp_log("DEL", f"Removed vectors of deleted file: {name}")
+
+    pending = []
+    for file, fhash in _current_hashes(list(DOC_PATH.glob("*.*")), STAT_FILE):
+        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
+            mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
+            continue
+        pending.append((file, fhash))
 
-            if not markdown.strip():
-                mcp_log("WARN", f"No content extracted from {file.name}")
+    def embed_into_shard(doc: str, chunks: list[str]):
+        """Embed `chunks` straight into `doc`'s shard. Returns (ids, vectors), or None if nothing came back."""
+        ids = store.allocate_ids(len(chunks))
+        parts = []
+        try:
+            with tqdm(total=len(chunks), desc=f"Embedding {doc}") as bar:
+                for vectors in embed_batches(chunks):
+                    done = sum(len(v) for v in parts)
+                    sharded.add(doc, ids[done:done + len(vectors)], vectors)
+                    parts.append(vectors)
+                    bar.update(len(vectors))
+        except Exception:
+            # Drop this batch's partial vectors; they were never logged or stored
+            done = sum(len(v) for v in parts)
+            sharded.discard(doc, ids[:done])
+            raise
+        return (ids, np.concatenate(parts)) if parts else None
+
+    def index_markdown(file: Path, fhash: str, markdown: str) -> bool:
+        if not markdown.strip():
+            mcp_log("WARN", f"No content extracted from {file.name}")
+            return False
+
+        if len(markdown.split()) < 10:
+            mcp_log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
+            chunks = [markdown.strip()]
+        else:
+            mcp_log("INFO", f"Running {CHUNKING_MODE} chunking on {file.name} with {len(markdown.split())} words")
+            chunks = chunk_markdown(markdown)
+
+        embedded = embed_into_shard(file.name, chunks)
+        if embedded is None:
+            return False
+        ids, file_vectors = embedded
+
+        # ✅ Swap the file's chunks in the store, append the change to its
+        # shard's WAL, then drop its previous vectors from that shard in place.
+        # Only shards that changed are rewritten, every CHECKPOINT_EVERY files.
+        old_ids = store.replace_doc(
+            doc=file.name,
+            ids=ids,
+            chunk_ids=[f"{file.stem}_{i}" for i in range(len(chunks))],
+            chunks=chunks,
+            vectors=file_vectors,
+        )
+        sharded.commit_doc(file.name, fhash, ids, file_vectors, old_ids)
+        # Only now: a hash recorded earlier would survive a failed swap and skip the file for good
+        CACHE_META[file.name] = fhash
+        mcp_log("SAVE", f"Logged {file.name} to shard {sharded.shard_for(file.name)}"
+                        f" (+{len(ids)} / -{len(old_ids)} vectors)")
+        return True
+
+    def index_pdf_streaming(file: Path, fhash: str, batches) -> bool:
+        """
+        Chunk, embed and log a long PDF one page batch at a time, in page order,
+        as the workers finish extracting `batches`. Each batch is searchable as
+        soon as it is logged; the file's previous chunks are dropped and its hash
+        recorded only at the end, so an interrupted run re-indexes the whole file
+        next time.
+        """
+        old_ids = store.ids_for_doc(file.name)
+        n_chunks = 0
+
+        def emit(chunks: list[str], pages: str) -> None:
+            nonlocal n_chunks
+            embedded = embed_into_shard(file.name, chunks)
+            if embedded is None:
+                return
+            ids, vectors = embedded
+            chunk_ids = [f"{file.stem}_{n_chunks + i}" for i in range(len(chunks))]
+            store.add_chunks(ids, file.name, chunk_ids, chunks, vectors)
+            sharded.log_vectors(file.name, ids, vectors)
+            n_chunks += len(chunks)
+            mcp_log("SAVE", f"Logged {file.name} pages {pages} to shard {sharded.shard_for(file.name)}"
+                            f" (+{len(ids)} vectors)")
+
+        carry = ""
+        for start, end, page_count, markdown in batches:
+            text = f"{carry}\n\n{markdown}".strip()
+            if not text:
                 continue
+            chunks = chunk_markdown(text) if len(text.split()) >= 10 else [text]
+            # The last chunk may run on into the next pages: re-chunk it together with them
+            carry = chunks.pop() if end < page_count and len(chunks) > 1 else ""
+            if chunks:
+                emit(chunks, f"{start + 1}-{end}/{page_count}")
+        if carry:
+            emit([carry], "tail")
+
+        if n_chunks == 0:
+            mcp_log("WARN", f"No content extracted from {file.name}")
+            return False
+        store.delete_ids(old_ids)
+        sharded.finish_doc(file.name, fhash, old_ids)
+        CACHE_META[file.name] = fhash
+        mcp_log("SAVE", f"Finished {file.name} ({n_chunks} chunks, -{len(old_ids)} old vectors)")
+        return True
+
+    # Long PDFs are extracted page batch by page batch on the same worker pool
+    page_counts = {file: pages for file, _ in pending if (pages := _stream_page_count(file))}
+    work = _extract_in_parallel(pending, workers, page_counts)
+
+    files_since_checkpoint = 0
+    for done, (file, fhash, markdown, error) in enumerate(work):
+        if progress is not None:
+            progress(done, len(pending), file.name)
+        if error is not None:
+            mcp_log("ERROR", f"Failed to extract {file.name}: {error}")
+            continue
 
-            if len(markdown.split()) < 10:
-                mcp_log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
-                chunks = [markdown.strip()]
+        mcp_log("PROC", f"Processing: {file.name}")
+        try:
+            if isinstance(markdown, str):
+                indexed = index_markdown(file, fhash, markdown)
             else:
-                mcp_log("INFO", f"Running semantic merge on {file.name} with {len(markdown.split())} words")
-                chunks = semantic_merge(markdown)
-
-
-            embeddings_for_file = []
-            new_metadata = []
-            for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
-                embedding = get_embedding(chunk)
-                embeddings_for_file.append(embedding)
-                new_metadata.append({
-                    "doc": file.name,
-                    "chunk": chunk,
-                    "chunk_id": f"{file.stem}_{i}"
-                })
-
-            if embeddings_for_file:
-                if index is None:
-                    dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
-                metadata.extend(new_metadata)
-                CACHE_META[file.name] = fhash
-
-                # ✅ Immediately save index and metadata
-                CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
-                METADATA_FILE.write_text(json.dumps(metadata, indent=2))
-                faiss.write_index(index, str(INDEX_FILE))
-                mcp_log("SAVE", f"Saved FAISS index and metadata after processing {file.name}")
+                indexed = index_pdf_streaming(file, fhash, markdown)
+            if indexed:
+                files_since_checkpoint += 1
+                if files_since_checkpoint >= CHECKPOINT_EVERY:
+                    checkpoint()
+                    files_since_checkpoint = 0
 
         except Exception as e:
             mcp_log("ERROR", f"Failed to process {file.name}: {e}")
 
+    if sharded.dirty:
+        checkpoint()
+    sharded.rebuild_if_needed()
+    if progress is not None:
+        progress(len(pending), len(pending), None)
+
+
+def _file_md5(path: Path) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def _current_hashes(files: list[Path], stat_file: Path, workers: int = HASH_WORKERS) -> list[tuple[Path, str]]:
+    """
+    md5 of every file, reading only files whose (size, mtime_ns, inode) differs
+    from the manifest in `stat_file`; those are hashed in parallel. The stat is
+    taken before reading, so a file written during hashing is re-hashed next time.
+    """
+    manifest = json.loads(stat_file.read_text()) if stat_file.exists() else {}
+    stats, hashes, changed = {}, {}, []
+    for file in files:
+        try:
+            st = file.stat()
+        except FileNotFoundError:
+            continue  # deleted since it was listed
+        stats[file.name] = [st.st_size, st.st_mtime_ns, st.st_ino]
+        entry = manifest.get(file.name)
+        if entry is not None and entry[:3] == stats[file.name]:
+            hashes[file.name] = entry[3]
+        else:
+            changed.append(file)
+
+    if changed:
+        mcp_log("INFO", f"Hashing {len(changed)} new or modified file(s)")
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(changed)))) as pool:
+            for file, fhash in zip(changed, pool.map(_file_md5, changed)):
+                hashes[file.name] = fhash
+
+    new_manifest = {name: stats[name] + [hashes[name]] for name in stats}
+    if new_manifest != manifest:
+        _atomic_write_text(stat_file, json.dumps(new_manifest, indent=2))
+    return [(file, hashes[file.name]) for file in files if file.name in hashes]
+
+
+def _reset_if_embedder_changed(store: ChunkStore, doc_hashes: dict) -> bool:
+    """
+    Vectors from different embedders can't share an index. When EMBED_BACKEND
+    changes, drop every chunk and shard so all documents are indexed again.
+    Returns True if the index was reset.
+    """
+    name = get_embedder().name
+    previous = store.get_meta("embedder")
+    if previous is None and store.count():
+        # Chunks from before the embedder was recorded (migrated from metadata.json /
+        # index.bin) were embedded one text at a time via /api/embeddings
+        previous = OllamaEmbedder(EMBED_MODEL, EMBED_URL, batched=False).name
+    if previous is None or previous == name:
+        store.set_meta("embedder", name)
+        return False
+    mcp_log("WARN", f"Embedder changed ({previous} → {name}); re-indexing all documents")
+    for doc in store.docs():
+        store.delete_doc(doc)
+    manifest = SHARD_DIR / MANIFEST_FILE
+    if manifest.exists():
+        manifest.unlink()  # the next load reshards from the now-empty store
+    doc_hashes.clear()
+    store.set_meta("embedder", name)
+    return True
+
+
+def _retire_legacy_index(store: ChunkStore, doc_hashes: dict) -> bool:
+    """
+    Fold the document hashes still in a pre-sharding index.wal into `doc_hashes`
+    once; the shards are rebuilt from the chunk store. index.bin / index.wal are
+    left in place (index.bin ships with the repo) and a "retired_legacy_index"
+    meta row stops this from running again. Returns True if `doc_hashes` changed.
+    """
+    legacy = [path for path in (LEGACY_INDEX_FILE, LEGACY_INDEX_WAL) if path.exists()]
+    if not legacy or store.get_meta("retired_legacy_index"):
+        return False
+    before = dict(doc_hashes)
+    if LEGACY_INDEX_WAL.exists():
+        IndexWAL(LEGACY_INDEX_WAL).replay(None, doc_hashes, lambda index, ids: index)
+    ids, _ = store.all_vectors()
+    if len(ids) < store.count():
+        # Chunks without stored vectors can't be sharded; index those files again
+        mcp_log("WARN", "Chunk store is missing vectors for the old index; re-indexing all documents")
+        doc_hashes.clear()
+    store.set_meta("retired_legacy_index", 1)
+    mcp_log("INFO", f"Read single-file index; building {INDEX_SHARDS} shards from {CHUNKS_DB.name}")
+    return doc_hashes != before
+
+
+def get_indexer() -> BackgroundIndexer:
+    global _indexer
+    with _resident_lock:
+        if _indexer is None:
+            _indexer = BackgroundIndexer(ROOT / "documents", process_documents, WATCH_POLL_INTERVAL, WATCH_DEBOUNCE)
+        return _indexer
 
 
 def ensure_faiss_ready():
-    from pathlib import Path
-    index_path = ROOT / "faiss_index" / "index.bin"
-    meta_path = ROOT / "faiss_index" / "metadata.json"
-    if not (index_path.exists() and meta_path.exists()):
-        mcp_log("INFO", "Index not found — running process_documents()...")
-        process_documents()
-    else:
-        mcp_log("INFO", "Index already exists. Skipping regeneration.")
+    """Make sure the background indexer is running; never builds the index on the caller's thread."""
+    indexer = get_indexer()
+    if not indexer.running:
+        mcp_log("INFO", "Starting background indexer for documents/")
+        indexer.start()
+
+
+@mcp.tool()
+def index_status() -> dict:
+    """Background indexer state and progress (files done / total, last run, last error). Usage: index_status"""
+    status = get_indexer().status()
+    status["indexed_chunks"] = get_chunk_store().count()
+    status["indexed_vectors"] = get_resident_index().ntotal
+    return status
 
 
 if __name__ == "__main__":
@@ -409,11 +1093,8 @@ if __name__ == "__main__":
         server_thread.daemon = True
         server_thread.start()
         
-        # Wait a moment for the server to start
-        time.sleep(2)
-        
-        # Process documents after server is running
-        process_documents()
+        # Index documents/ in the background and keep watching it for changes
+        ensure_faiss_ready()
         
         # Keep the main thread alive
         try:
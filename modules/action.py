@@ -1,6 +1,6 @@
 # modules/action.py
 
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Union
 from pydantic import BaseModel
 import ast
 
@@ -60,3 +60,15 @@ def parse_function_call(response: str) -> tuple[str, Dict[str, Any]]:
     except Exception as e:
         log("parser", f"❌ Parse failed: {e}")
         raise
+
+
+def parse_function_calls(plan: str) -> List[tuple[str, Dict[str, Any]]]:
+    """
+    Parses a plan holding one or more FUNCTION_CALL lines, e.g.
+    "FUNCTION_CALL: search_documents|query=Gensol\\nFUNCTION_CALL: search_documents|query=Go-Auto"
+    Into a list of (tool name, arguments), in order.
+    """
+    calls = [parse_function_call(line.strip()) for line in plan.splitlines() if line.strip().startswith("FUNCTION_CALL:")]
+    if not calls:
+        raise ValueError("Invalid function call format.")
+    return calls
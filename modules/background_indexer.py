@@ -0,0 +1,170 @@
+# modules/background_indexer.py → Background Document Indexer
+# Role: Keep the document index in step with documents/ without blocking searches.
+
+# Responsibilities:
+
+# Poll the documents directory for added, changed or deleted files (size + mtime)
+
+# Debounce bursts of changes: index once the directory has been quiet for a while
+
+# Run the indexing function on its own thread and record progress / errors for a status tool
+
+# Dependencies:
+
+# modules/mcp_log.py; otherwise stdlib only (polling; no inotify / watchdog dependency)
+
+# Used by: mcp_server_2.py
+
+# Inputs: Directory to watch, index_fn(progress=callback)
+
+# Outputs: status() dict
+
+# modules/background_indexer.py
+
+import os
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from modules.mcp_log import mcp_log
+
+
+class BackgroundIndexer:
+    def __init__(
+        self,
+        directory: Path,
+        index_fn: Callable,
+        poll_interval: float = 2.0,
+        debounce: float = 3.0,
+    ):
+        self.directory = Path(directory)
+        self.index_fn = index_fn
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._requested = False
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._status = {
+            "state": "stopped",  # stopped | waiting | indexing | idle
+            "runs": 0,
+            "last_started": None,
+            "last_finished": None,
+            "last_duration_s": None,
+            "last_error": None,
+            "files_done": 0,
+            "files_total": 0,
+            "current_file": None,
+        }
+
+    # --- public API ---
+
+    def start(self) -> None:
+        """Start watching (idempotent). The first pass indexes immediately."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="background-indexer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def trigger(self) -> None:
+        """Ask for an indexing pass even if no file change was seen."""
+        self._requested = True
+        self._wake.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> dict:
+        with self._lock:
+            status = dict(self._status)
+        status["watching"] = str(self.directory)
+        status["poll_interval_s"] = self.poll_interval
+        status["debounce_s"] = self.debounce
+        return status
+
+    # --- internals ---
+
+    def _set(self, **fields) -> None:
+        with self._lock:
+            self._status.update(fields)
+
+    def _progress(self, done: int, total: int, current: Optional[str] = None) -> None:
+        self._set(files_done=done, files_total=total, current_file=current)
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        try:
+            with os.scandir(self.directory) as entries:
+                return {
+                    e.name: (e.stat().st_size, e.stat().st_mtime_ns)
+                    for e in entries
+                    if e.is_file() and "." in e.name
+                }
+        except FileNotFoundError:
+            return {}
+
+    def _sleep(self, seconds: float) -> bool:
+        """Wait up to `seconds`; True if woken by stop() or trigger()."""
+        woken = self._wake.wait(seconds)
+        self._wake.clear()
+        return woken
+
+    def _settle(self, snapshot: dict) -> Optional[dict]:
+        """Wait until the directory stops changing for `debounce` seconds; None if stopped."""
+        self._set(state="waiting")
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < self.debounce:
+            self._sleep(min(self.poll_interval, self.debounce))
+            if self._stopped:
+                return None
+            latest = self._snapshot()
+            if latest != snapshot:
+                snapshot, quiet_since = latest, time.monotonic()
+        return snapshot
+
+    def _index(self) -> None:
+        started = time.time()
+        self._set(state="indexing", last_started=started, last_error=None,
+                  files_done=0, files_total=0, current_file=None)
+        try:
+            self.index_fn(progress=self._progress)
+        except Exception as e:
+            mcp_log("ERROR", f"Background indexing failed: {e}\n{traceback.format_exc()}")
+            self._set(last_error=str(e))
+        finished = time.time()
+        with self._lock:
+            self._status.update(
+                state="idle",
+                runs=self._status["runs"] + 1,
+                last_finished=finished,
+                last_duration_s=round(finished - started, 2),
+                current_file=None,
+            )
+
+    def _run(self) -> None:
+        seen = None
+        while not self._stopped:
+            snapshot = self._snapshot()
+            if seen is None or snapshot != seen or self._requested:
+                # The startup pass runs at once; later passes wait for the burst to settle
+                if seen is not None:
+                    snapshot = self._settle(snapshot)
+                    if snapshot is None:
+                        break
+                self._requested = False
+                self._index()
+                # Errors are not retried in a loop: the next change or trigger() runs again
+                seen = snapshot
+            self._sleep(self.poll_interval)
+        self._set(state="stopped")
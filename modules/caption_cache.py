@@ -0,0 +1,92 @@
+# modules/caption_cache.py → Image Caption Cache
+# Role: Remember image captions by image content so nothing is captioned twice.
+
+# Responsibilities:
+
+# Key captions by (vision model, sha256(image bytes))
+
+# Persist across re-indexing runs and share between extraction worker processes
+
+# Dependencies:
+
+# sqlite3
+
+# Used by: mcp_server_2.py (replace_images_with_captions)
+
+# Inputs: Model + image hash (+ caption on put)
+
+# Outputs: Cached caption or None
+
+# modules/caption_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_CACHE_PATH = ROOT / "faiss_index" / "caption_cache.db"
+
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class CaptionCache:
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS captions (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                caption TEXT NOT NULL,
+                PRIMARY KEY (model, hash)
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, model: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT caption FROM captions WHERE model = ? AND hash = ?", (model, key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, model: str, key: str, caption: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO captions (model, hash, caption) VALUES (?, ?, ?)",
+                (model, key, caption),
+            )
+            self._conn.commit()
+
+
+_default_cache: Optional[CaptionCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> CaptionCache:
+    """Process-wide cache at faiss_index/caption_cache.db."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = CaptionCache()
+        return _default_cache
+
+
+def _reset_after_fork() -> None:
+    # Forked extraction workers must open their own connection: SQLite connections
+    # can't cross fork(), and the parent may have held the lock at fork time
+    global _default_cache, _default_lock
+    _default_cache = None
+    _default_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,275 @@
+# modules/chunk_store.py → Document Chunk Store
+# Role: Indexed on-disk store of RAG chunks, addressed by FAISS vector id.
+
+# Responsibilities:
+
+# Persist chunk text, source doc and chunk_id per vector id
+
+# Keep the embedding next to its chunk so the index can be rebuilt without re-embedding
+
+# Fetch only the requested rows (primary-key lookup, memory-mapped reads)
+
+# BM25 keyword search over chunk text (SQLite FTS5), updated with every write
+
+# One-shot migration from the legacy metadata.json list
+
+# Dependencies:
+
+# sqlite3, numpy
+
+# Used by: mcp_server_2.py
+
+# Inputs: Vector ids + chunk rows
+
+# Outputs: {id: {"doc", "chunk", "chunk_id"}} dicts
+
+# modules/chunk_store.py
+
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MMAP_SIZE = 1 << 30  # let SQLite mmap up to 1 GB of the file for reads
+
+
+class ChunkStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        self._conn.execute("PRAGMA recursive_triggers=ON")  # INSERT OR REPLACE must fire delete triggers
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                doc TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                chunk TEXT NOT NULL,
+                vector BLOB
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc)")
+        # Untyped value: holds integers (next_id) and text (embedder name)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value NOT NULL)")
+        self._create_text_index()
+        self._conn.commit()
+
+    def _create_text_index(self) -> None:
+        """BM25 full-text index over chunk text, kept in sync with `chunks` by triggers."""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'"
+        ).fetchone()
+        self._conn.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                chunk, content='chunks', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts(rowid, chunk) VALUES (new.id, new.chunk);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, chunk) VALUES ('delete', old.id, old.chunk);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_au AFTER UPDATE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, chunk) VALUES ('delete', old.id, old.chunk);
+                INSERT INTO chunks_fts(rowid, chunk) VALUES (new.id, new.chunk);
+            END;
+            """
+        )
+        if not exists:
+            # Store created before the text index existed: index what is already there
+            self._conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+
+    def _insert_rows(self, ids, doc, chunk_ids, chunks, vectors) -> None:
+        blobs = [None] * len(ids) if vectors is None else [
+            np.ascontiguousarray(v, dtype=np.float32).tobytes() for v in vectors
+        ]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO chunks (id, doc, chunk_id, chunk, vector) VALUES (?, ?, ?, ?, ?)",
+            [(int(i), doc, cid, text, blob) for i, cid, text, blob in zip(ids, chunk_ids, chunks, blobs)],
+        )
+
+    def add_chunks(
+        self,
+        ids: List[int],
+        doc: str,
+        chunk_ids: List[str],
+        chunks: List[str],
+        vectors: Optional[np.ndarray] = None,
+    ) -> None:
+        with self._lock:
+            self._insert_rows(ids, doc, chunk_ids, chunks, vectors)
+            self._conn.commit()
+
+    def replace_doc(
+        self,
+        doc: str,
+        ids: List[int],
+        chunk_ids: List[str],
+        chunks: List[str],
+        vectors: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Atomically swap all of `doc`'s rows for new ones. Returns the ids that were removed."""
+        with self._lock:
+            old_ids = self._doc_ids(doc)
+            self._conn.execute("DELETE FROM chunks WHERE doc = ?", (doc,))
+            self._insert_rows(ids, doc, chunk_ids, chunks, vectors)
+            self._conn.commit()
+        return old_ids
+
+    def delete_doc(self, doc: str) -> np.ndarray:
+        """Remove all of `doc`'s rows. Returns the ids that were removed."""
+        with self._lock:
+            old_ids = self._doc_ids(doc)
+            self._conn.execute("DELETE FROM chunks WHERE doc = ?", (doc,))
+            self._conn.commit()
+        return old_ids
+
+    def delete_ids(self, ids: Iterable[int]) -> None:
+        ids = [int(i) for i in ids]
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(part))})", part)
+            self._conn.commit()
+
+    def _doc_ids(self, doc: str) -> np.ndarray:
+        rows = self._conn.execute("SELECT id FROM chunks WHERE doc = ? ORDER BY id", (doc,)).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def ids_for_doc(self, doc: str) -> np.ndarray:
+        """Vector ids of `doc`, a contiguous range since ids are allocated per document."""
+        with self._lock:
+            return self._doc_ids(doc)
+
+    def allocate_ids(self, n: int) -> np.ndarray:
+        """Reserve `n` fresh vector ids. Ids are never reused, even after deletion."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+            if row is None:
+                (max_id,) = self._conn.execute("SELECT MAX(id) FROM chunks").fetchone()
+                start = 0 if max_id is None else max_id + 1
+            else:
+                start = row[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (start + n,)
+            )
+            self._conn.commit()
+        return np.arange(start, start + n, dtype=np.int64)
+
+    def get_meta(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def _select_by_ids(self, sql: str, ids: List[int]) -> list:
+        rows = []
+        with self._lock:
+            for i in range(0, len(ids), 500):  # stay under SQLite's bound-parameter limit
+                part = ids[i:i + 500]
+                rows.extend(self._conn.execute(sql.format(marks=",".join("?" * len(part))), part).fetchall())
+        return rows
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, dict]:
+        ids = list({int(i) for i in ids if i >= 0})
+        rows = self._select_by_ids("SELECT id, doc, chunk_id, chunk FROM chunks WHERE id IN ({marks})", ids)
+        return {row[0]: {"doc": row[1], "chunk_id": row[2], "chunk": row[3]} for row in rows}
+
+    def search_text(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """BM25 keyword search. Returns [(id, score)] best first; higher score is better."""
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ? "
+                "ORDER BY bm25(chunks_fts) LIMIT ?",
+                (match, k),
+            ).fetchall()
+        return [(row[0], -row[1]) for row in rows]  # SQLite's bm25() is lower-is-better
+
+    def get_vectors(self, ids: Iterable[int]) -> Dict[int, np.ndarray]:
+        ids = list({int(i) for i in ids if i >= 0})
+        rows = self._select_by_ids(
+            "SELECT id, vector FROM chunks WHERE id IN ({marks}) AND vector IS NOT NULL", ids
+        )
+        return {row[0]: np.frombuffer(row[1], dtype=np.float32) for row in rows}
+
+    def all_vectors(self, docs: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, vectors) for every chunk with a stored vector, ordered by id; optionally only `docs`."""
+        if docs is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, vector FROM chunks WHERE vector IS NOT NULL ORDER BY id"
+                ).fetchall()
+        else:
+            rows = sorted(self._select_by_ids(
+                "SELECT id, vector FROM chunks WHERE doc IN ({marks}) AND vector IS NOT NULL", list(docs)
+            ))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        vectors = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        return ids, vectors
+
+    def docs(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT doc FROM chunks").fetchall()
+        return [row[0] for row in rows]
+
+    def all_ids(self) -> np.ndarray:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks").fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def migrate_from_json(self, metadata_path: Path, index=None) -> int:
+        """
+        Import a legacy metadata.json (list position == vector id) into an empty
+        store, backfilling vectors from `index` when it can reconstruct them.
+        The JSON file is only read; a "migrated_json" meta row makes this run once.
+        """
+        metadata_path = Path(metadata_path)
+        if not metadata_path.exists() or self.count() > 0 or self.get_meta("migrated_json"):
+            return 0
+
+        metadata = json.loads(metadata_path.read_text())
+        vectors = None
+        if index is not None and index.ntotal == len(metadata):
+            try:
+                vectors = index.reconstruct_n(0, index.ntotal)
+            except RuntimeError:
+                vectors = None  # index type without reconstruction support
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO chunks (id, doc, chunk_id, chunk, vector) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (i, m["doc"], m["chunk_id"], m["chunk"],
+                     None if vectors is None else vectors[i].tobytes())
+                    for i, m in enumerate(metadata)
+                ],
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_json', 1)")
+            self._conn.commit()
+        return len(metadata)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -18,6 +18,8 @@ except ImportError:
 
 model = ModelManager()
 
+MAX_PARALLEL_CALLS = 4  # independent FUNCTION_CALL lines accepted in one plan
+
 
 async def generate_plan(
     perception: PerceptionResult,
@@ -35,11 +37,13 @@ async def generate_plan(
 You are a reasoning-driven AI agent with access to tools and memory.
 Your job is to solve the user's request step-by-step by reasoning through the problem, selecting a tool if needed, and continuing until the FINAL_ANSWER is produced.
 
-Respond in **exactly one line** using one of the following formats:
+Respond using one of the following formats:
 
 - FUNCTION_CALL: tool_name|param1=value1|param2=value2
 - FINAL_ANSWER: [your final result] *(Not description, but actual final answer)
 
+Normally respond with exactly one line. If several tool calls are needed that do NOT depend on each other's results, put up to {MAX_PARALLEL_CALLS} FUNCTION_CALL lines (one per line) in the same response; they run in parallel and you get all results together.
+
 🧠 Context:
 - Step: {step_num} of {max_steps}
 - Memory: 
@@ -63,6 +67,11 @@ Respond in **exactly one line** using one of the following formats:
   - FUNCTION_CALL: search_documents|query="relationship between Cricket and Sachin Tendulkar"
   - [receives a detailed document]
   - FINAL_ANSWER: [Sachin Tendulkar is widely regarded as the "God of Cricket" due to his exceptional skills, longevity, and impact on the sport in India. He is the leading run-scorer in both Test and ODI cricket, and the first to score 100 centuries in international cricket. His influence extends beyond his statistics, as he is seen as a symbol of passion, perseverance, and a national icon. ]
+- User asks: "Compare Gensol and Go-Auto"
+  - FUNCTION_CALL: search_documents|query="Gensol Engineering"
+    FUNCTION_CALL: search_documents|query="Go-Auto"
+  - [receives both results together]
+  - FINAL_ANSWER: [...]
 
 ---
 
@@ -74,6 +83,7 @@ Respond in **exactly one line** using one of the following formats:
 - 🔁 Analyze that whether you have already got a good factual result from a tool, do NOT search again — summarize and respond with FINAL_ANSWER.
 - ❌ NEVER repeat tool calls with the same parameters unless the result was empty. When searching rely on first reponse from tools, as that is the best response probably.
 - ❌ NEVER output explanation text — only structured FUNCTION_CALL or FINAL_ANSWER.
+- 🔀 Only batch FUNCTION_CALL lines whose inputs are already known; if a call needs another call's result, make them in separate steps. Never mix FUNCTION_CALL and FINAL_ANSWER in one response.
 - ✅ Use nested keys like `input.string` or `input.int_list`, and square brackets for lists.
 - 💡 If no tool fits or you're unsure, end with: FINAL_ANSWER: [unknown]
 - ⏳ You have 3 attempts. Final attempt must end with FINAL_ANSWER.
@@ -85,10 +95,17 @@ Respond in **exactly one line** using one of the following formats:
         raw = (await model.generate_text(prompt)).strip()
         log("plan", f"LLM output: {raw}")
 
+        calls = []
         for line in raw.splitlines():
-            if line.strip().startswith("FUNCTION_CALL:") or line.strip().startswith("FINAL_ANSWER:"):
-                return line.strip()
-
+            line = line.strip()
+            if line.startswith("FUNCTION_CALL:"):
+                calls.append(line)
+            elif line.startswith("FINAL_ANSWER:") and not calls:
+                return line
+
+        if calls:
+            # One FUNCTION_CALL per line; the loop runs them concurrently
+            return "\n".join(calls[:MAX_PARALLEL_CALLS])
         return "FINAL_ANSWER: [unknown]"
 
     except Exception as e:
@@ -0,0 +1,197 @@
+# modules/embedders.py → Pluggable Embedders
+# Role: One interface for turning texts into vectors, whatever computes them.
+
+# Responsibilities:
+
+# OllamaEmbedder: /api/embed (batched, normalized) or /api/embeddings (one text per call) over the pooled client
+
+# LocalEmbedder: in-process sentence-transformers model on CPU with batched inference (no HTTP hop),
+# loaded offline from the models.json "path" (the Hugging Face hub only with "allow_download": true)
+# and applying the model's document / query task prefixes (nomic: "search_document: " / "search_query: ")
+
+# HashingEmbedder: deterministic feature-hashing vectors for tests and offline benchmarks
+
+# Build an embedder from a config/models.json entry
+
+# Dependencies:
+
+# numpy, modules/ollama_client.py, modules/mcp_log.py; sentence-transformers (optional, LocalEmbedder only)
+
+# Used by: mcp_server_2.py, modules/memory.py
+
+# Inputs: List of texts
+
+# Outputs: (len(texts), dim) float32 array
+
+# modules/embedders.py
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from modules.mcp_log import mcp_log
+from modules.ollama_client import OllamaClient, get_default_client
+
+ROOT = Path(__file__).parent.parent
+MODELS_JSON = ROOT / "config" / "models.json"
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder:
+    """
+    `name` identifies the vector space: vectors from embedders with different
+    names must never be mixed in one index, and it namespaces the embedding
+    cache. `cacheable` is False for embedders cheaper than a cache lookup.
+    embed() is for stored texts; embed_queries() for search queries, which
+    some models embed differently (cached under `query_name`).
+    """
+
+    name: str = ""
+    cacheable: bool = True
+
+    @property
+    def query_name(self) -> str:
+        return self.name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self.embed(texts)
+
+
+class OllamaEmbedder(Embedder):
+    def __init__(self, model: str, url: str, batched: bool = True, client: Optional[OllamaClient] = None):
+        self.model = model
+        self.url = url
+        self.batched = batched
+        self.client = client
+        self.name = f"{model}@{url}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        client = self.client or get_default_client()
+        if self.batched:
+            result = client.post_json(self.url, {"model": self.model, "input": texts})
+            return np.array(result["embeddings"], dtype=np.float32)
+        vectors = [client.post_json(self.url, {"model": self.model, "prompt": text})["embedding"] for text in texts]
+        return np.array(vectors, dtype=np.float32)
+
+
+class LocalEmbedder(Embedder):
+    """sentence-transformers model loaded once and run in-process."""
+
+    def __init__(
+        self,
+        model: str,
+        dimension: Optional[int] = None,
+        batch_size: int = 32,
+        device: str = "cpu",
+        document_prefix: str = "",
+        query_prefix: str = "",
+        local_files_only: bool = True,
+    ):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "LocalEmbedder needs sentence-transformers: pip install sentence-transformers"
+            ) from e
+        # nomic-embed models ship custom modelling code; with local_files_only it must
+        # already be on disk (model directory or HF cache) and nothing is fetched
+        self._model = SentenceTransformer(
+            model, device=device, trust_remote_code=True, local_files_only=local_files_only
+        )
+        self.batch_size = batch_size
+        self.dimension = dimension or self._model.get_sentence_embedding_dimension()
+        self.document_prefix = document_prefix
+        self.query_prefix = query_prefix
+        # Prefixes change the vectors, so they are part of the vector space's name
+        self.name = f"local:{Path(model).name}" + (f"|{document_prefix.strip()}" if document_prefix else "")
+
+    @property
+    def query_name(self) -> str:
+        return f"{self.name}|{self.query_prefix.strip()}" if self.query_prefix else self.name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._encode([self.document_prefix + text for text in texts])
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self._encode([self.query_prefix + text for text in texts])
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        vectors = self._model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vectors[:, :self.dimension], dtype=np.float32)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Signed feature hashing of lower-cased word tokens, L2-normalised. Same
+    text → same vector in every process, with no model and no network.
+    Texts sharing words land close together, which is enough for tests.
+    """
+
+    cacheable = False
+
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+        self.name = f"hashing:{dimension}"
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in TOKEN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if (digest >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.stack([self._vector(text) for text in texts])
+
+
+def create_embedder(key: str, models_path: Path = MODELS_JSON, **overrides) -> Embedder:
+    """Build the embedder for a config/models.json model key ("nomic", "phi4", "hashing", ...)."""
+    info = json.loads(Path(models_path).read_text())["models"][key]
+    kind = info["type"]
+    if kind == "ollama":
+        return OllamaEmbedder(info["embedding_model"], info["url"]["embed"], batched=info["url"]["embed"].endswith("/api/embed"), **overrides)
+    if kind == "huggingface":
+        path = ROOT / info["path"] if info.get("path") else None
+        if path is not None and path.exists():
+            source, download = str(path), False
+        elif info.get("allow_download", False):
+            # Explicit opt-in: fetches the model and its custom code from the hub
+            mcp_log("WARN", f"Loading {info['model']} from the Hugging Face hub (allow_download is set for '{key}')")
+            source, download = info["model"], True
+        else:
+            where = f"at {path}" if path is not None else "(no \"path\" set in models.json)"
+            raise FileNotFoundError(
+                f"Embedding model '{key}' is not stored locally {where}. Download it with "
+                f"`huggingface-cli download {info['model']} --local-dir <path>`, or set "
+                f"\"allow_download\": true for '{key}' in config/models.json to fetch it from the hub."
+            )
+        return LocalEmbedder(
+            source,
+            info.get("embedding_dimension"),
+            document_prefix=info.get("document_prefix", ""),
+            query_prefix=info.get("query_prefix", ""),
+            local_files_only=not download,
+            **overrides,
+        )
+    if kind == "hashing":
+        return HashingEmbedder(info.get("embedding_dimension", 768))
+    raise ValueError(f"Model '{key}' of type '{kind}' cannot be used as an embedder")
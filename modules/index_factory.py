@@ -0,0 +1,223 @@
+# modules/index_factory.py → FAISS Index Factory
+# Role: Build the right FAISS index type for the size of the corpus.
+
+# Responsibilities:
+
+# Build Flat, IVF-Flat, HNSW or IVF-PQ indexes with sensible parameters
+
+# Store vectors as float32, fp16, int8 scalar-quantized (sq8) or product-quantized (pq)
+
+# Pick the index type automatically from the number of vectors
+
+# Train on a random sample when the index type needs it
+
+# Dependencies:
+
+# faiss, numpy
+
+# Used by: mcp_server_2.py, bench_index.py
+
+# Inputs: Index kind (or "auto") + vector encoding + vectors
+
+# Outputs: Trained, populated FAISS index (wrapped in IndexIDMap2 for stable ids)
+
+# modules/index_factory.py
+
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_KINDS = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# How each vector is stored inside the index. float32 is exact; the rest trade
+# recall for memory (768-dim: 3072 B → fp16 1536 B, sq8 768 B, pq 64 B).
+VECTOR_ENCODINGS = ("float32", "fp16", "sq8", "pq")
+
+# Auto-selection thresholds (number of vectors)
+FLAT_MAX = 10_000        # exact search is fast enough below this
+HNSW_MAX = 100_000       # graph index, no training, high recall
+IVF_FLAT_MAX = 1_000_000 # beyond this, compress with PQ
+
+TRAIN_SAMPLE_SIZE = 50_000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+PQ_NBITS = 8
+PQ_MIN_TRAIN = 39 * 2 ** PQ_NBITS  # k-means wants ~39 points per centroid; PQ fails or degrades below this
+
+
+def trainable(encoding: str, n_vectors: int) -> bool:
+    """Whether an index storing `encoding` vectors can be trained on `n_vectors` vectors."""
+    return encoding != "pq" or n_vectors >= PQ_MIN_TRAIN
+
+
+def choose_index_kind(n_vectors: int) -> str:
+    if n_vectors < FLAT_MAX:
+        return "flat"
+    if n_vectors < HNSW_MAX:
+        return "hnsw"
+    if n_vectors < IVF_FLAT_MAX:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def resolve_index_kind(kind: str, n_vectors: int) -> str:
+    if kind == "auto":
+        return choose_index_kind(n_vectors)
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind '{kind}'. Expected 'auto' or one of {INDEX_KINDS}")
+    return kind
+
+
+def index_spec(kind: str, encoding: str, n_vectors: int):
+    """Canonical (kind, encoding) pair: IVF with PQ encoding is the ivf_pq kind and vice versa."""
+    kind = resolve_index_kind(kind, n_vectors)
+    if encoding not in VECTOR_ENCODINGS:
+        raise ValueError(f"Unknown vector encoding '{encoding}'. Expected one of {VECTOR_ENCODINGS}")
+    if kind == "ivf_pq" or (kind == "ivf_flat" and encoding == "pq"):
+        return "ivf_pq", "pq"
+    return kind, encoding
+
+
+def _unwrap(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def _sq_encoding(qtype) -> str:
+    return {faiss.ScalarQuantizer.QT_8bit: "sq8", faiss.ScalarQuantizer.QT_fp16: "fp16"}.get(qtype, f"sq{qtype}")
+
+
+def index_kind(index) -> str:
+    """Inverse of build_index: report which kind an existing index is."""
+    index = _unwrap(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, (faiss.IndexIVFFlat, faiss.IndexIVFScalarQuantizer)):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer, faiss.IndexPQ)):
+        return "flat"
+    return type(index).__name__
+
+
+def index_encoding(index) -> str:
+    """Report how an existing index stores its vectors (one of VECTOR_ENCODINGS)."""
+    index = _unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return _sq_encoding(index.sq.qtype)
+    return "float32"
+
+
+def describe_index(index):
+    return index_kind(index), index_encoding(index)
+
+
+def _ivf_nlist(n_vectors: int) -> int:
+    # faiss guideline: ~4*sqrt(N) lists, with at least 39 training points per list
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def _pq_m(dim: int) -> int:
+    # Largest sub-quantizer count <= 64 that divides the dimension
+    return next(m for m in range(min(64, dim), 0, -1) if dim % m == 0)
+
+
+def _sq_type(encoding: str):
+    return {"sq8": faiss.ScalarQuantizer.QT_8bit, "fp16": faiss.ScalarQuantizer.QT_fp16}[encoding]
+
+
+def _train_sample(vectors: np.ndarray, size: int = TRAIN_SAMPLE_SIZE, seed: int = 0) -> np.ndarray:
+    if len(vectors) <= size:
+        return vectors
+    rng = np.random.default_rng(seed)
+    return vectors[rng.choice(len(vectors), size=size, replace=False)]
+
+
+def build_index(
+    kind: str,
+    dim: int,
+    n_vectors: int,
+    train_vectors: Optional[np.ndarray] = None,
+    encoding: str = "float32",
+):
+    """
+    Create an empty index of `kind` ("auto" resolves by `n_vectors`) storing
+    vectors with `encoding`. Index types that need training (IVF, SQ, PQ) are
+    trained on a sample of `train_vectors` before returning.
+    """
+    kind, encoding = index_spec(kind, encoding, n_vectors)
+
+    if kind == "flat":
+        if encoding == "float32":
+            index = faiss.IndexFlatL2(dim)
+        elif encoding == "pq":
+            index = faiss.IndexPQ(dim, _pq_m(dim), PQ_NBITS)
+        else:
+            index = faiss.IndexScalarQuantizer(dim, _sq_type(encoding))
+
+    elif kind == "hnsw":
+        if encoding == "float32":
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        elif encoding == "pq":
+            index = faiss.IndexHNSWPQ(dim, _pq_m(dim), HNSW_M)
+        else:
+            index = faiss.IndexHNSWSQ(dim, _sq_type(encoding), HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+
+    else:
+        if train_vectors is None or len(train_vectors) == 0:
+            raise ValueError(f"Index kind '{kind}' needs training vectors")
+        nlist = _ivf_nlist(len(train_vectors))
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim), PQ_NBITS)
+        elif encoding == "float32":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, _sq_type(encoding))
+        index.nprobe = max(1, int(math.sqrt(nlist)))
+
+    if not index.is_trained:
+        if train_vectors is None or len(train_vectors) == 0:
+            raise ValueError(f"Index '{kind}' with '{encoding}' vectors needs training vectors")
+        if not trainable(encoding, len(train_vectors)):
+            raise ValueError(f"'{encoding}' vectors need at least {PQ_MIN_TRAIN} training vectors, got {len(train_vectors)}")
+        index.train(np.ascontiguousarray(_train_sample(train_vectors), dtype=np.float32))
+    return index
+
+
+def build_populated_index(kind: str, vectors: np.ndarray, encoding: str = "float32"):
+    """Build an index of `kind` sized for `vectors`, train it if needed, and add them."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = build_index(kind, vectors.shape[1], len(vectors), train_vectors=vectors, encoding=encoding)
+    index.add(vectors)
+    return index
+
+
+def build_id_index(kind: str, vectors: np.ndarray, ids: np.ndarray, encoding: str = "float32"):
+    """
+    Like build_populated_index, but wrapped in IndexIDMap2 so each vector keeps
+    a stable id (its chunk store id) and can be removed individually.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    inner = build_index(kind, vectors.shape[1], len(vectors), train_vectors=vectors, encoding=encoding)
+    index = faiss.IndexIDMap2(inner)
+    if len(vectors):
+        index.add_with_ids(vectors, np.ascontiguousarray(ids, dtype=np.int64))
+    return index
+
+
+def new_id_index(dim: int):
+    """Empty exact index with stable ids, used before the corpus is big enough to need more."""
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
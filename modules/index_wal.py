@@ -0,0 +1,148 @@
+# modules/index_wal.py → Index Write-Ahead Log
+# Role: Durable, append-only record of index changes between checkpoints.
+
+# Responsibilities:
+
+# Append add / remove / document-hash records instead of rewriting index.bin per file
+
+# Replay the log on top of the last checkpoint at startup (idempotent, torn-tail safe)
+
+# Reset after a checkpoint has been written via atomic rename
+
+# Dependencies:
+
+# faiss, numpy, modules/index_factory.py
+
+# Used by: mcp_server_2.py
+
+# Inputs: (ids, vectors) adds, id removals, {doc: md5} updates
+
+# Outputs: Index + doc hash map as of the last logged change
+
+# modules/index_wal.py
+
+import json
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import faiss
+import numpy as np
+
+from modules.index_factory import new_id_index
+
+OP_ADD = 1
+OP_REMOVE = 2
+OP_DOC = 3  # document hash update; hash None means the document was deleted
+
+# op, payload length, crc32(payload)
+_HEADER = struct.Struct("<BII")
+
+
+class IndexWAL:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    # --- writing ---
+
+    def _append(self, op: int, payload: bytes) -> None:
+        record = _HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def log_add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        head = struct.pack("<II", len(ids), vectors.shape[1])
+        self._append(OP_ADD, head + ids.tobytes() + vectors.tobytes())
+
+    def log_remove(self, ids: np.ndarray) -> None:
+        if len(ids):
+            self._append(OP_REMOVE, np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+
+    def log_doc(self, name: str, fhash: Optional[str]) -> None:
+        self._append(OP_DOC, json.dumps({"name": name, "hash": fhash}).encode("utf-8"))
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def reset(self) -> None:
+        """Empty the log. Call only after a checkpoint covering it is on disk."""
+        with self._lock:
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_bytes(b"")
+            os.replace(tmp, self.path)
+
+    # --- reading ---
+
+    def _records(self, truncate_torn: bool):
+        if not self.path.exists():
+            return
+        data = self.path.read_bytes()
+        pos = 0
+        while pos + _HEADER.size <= len(data):
+            op, length, crc = _HEADER.unpack_from(data, pos)
+            payload = data[pos + _HEADER.size: pos + _HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break  # torn or corrupt tail from a crash mid-append
+            yield op, payload
+            pos += _HEADER.size + length
+        if truncate_torn and pos < len(data):
+            with self._lock, open(self.path, "r+b") as f:
+                f.truncate(pos)
+
+    def replay(
+        self,
+        index,
+        doc_hashes: Dict[str, str],
+        remove_fn: Callable,
+        truncate_torn: bool = False,
+    ):
+        """
+        Apply logged changes to `index` (may be None) and `doc_hashes` (in place).
+        Adds of ids already in the index and removes of absent ids are skipped,
+        so replaying over a checkpoint that already contains them is harmless.
+        `remove_fn(index, ids)` performs removals and returns the index; if it
+        returns a different (rebuilt) index, the ids present are re-read from it.
+        Only the writer should pass truncate_torn=True.
+        """
+        present = set() if index is None else set(faiss.vector_to_array(index.id_map).tolist())
+        for op, payload in self._records(truncate_torn):
+            if op == OP_ADD:
+                n, dim = struct.unpack_from("<II", payload)
+                ids = np.frombuffer(payload, dtype=np.int64, count=n, offset=8)
+                vectors = np.frombuffer(payload, dtype=np.float32, count=n * dim, offset=8 + 8 * n).reshape(n, dim)
+                keep = np.array([i not in present for i in ids.tolist()], dtype=bool)
+                if keep.any():
+                    if index is None:
+                        index = new_id_index(dim)
+                    index.add_with_ids(np.ascontiguousarray(vectors[keep]), np.ascontiguousarray(ids[keep]))
+                    present.update(ids[keep].tolist())
+            elif op == OP_REMOVE:
+                ids = np.frombuffer(payload, dtype=np.int64)
+                ids = np.array([i for i in ids.tolist() if i in present], dtype=np.int64)
+                if len(ids):
+                    before = index
+                    index = remove_fn(index, ids)
+                    if index is before:
+                        present.difference_update(ids.tolist())
+                    else:
+                        # Rebuilt from the chunk store: it may already hold ids logged further on
+                        present = set() if index is None else set(faiss.vector_to_array(index.id_map).tolist())
+            elif op == OP_DOC:
+                entry = json.loads(payload.decode("utf-8"))
+                if entry["hash"] is None:
+                    doc_hashes.pop(entry["name"], None)
+                else:
+                    doc_hashes[entry["name"]] = entry["hash"]
+        return index
@@ -0,0 +1,25 @@
+# modules/mcp_log.py → MCP-safe Logging
+# Role: One log helper for code that runs inside an MCP stdio server.
+
+# Responsibilities:
+
+# Write "LEVEL: message" lines to stderr, never stdout (stdout carries the MCP stdio transport)
+
+# Dependencies:
+
+# stdlib only
+
+# Used by: mcp_server_2.py, modules/sharded_index.py, modules/background_indexer.py, modules/ollama_client.py, modules/embedders.py
+
+# Inputs: Level + message
+
+# Outputs: One line on stderr
+
+# modules/mcp_log.py
+
+import sys
+
+
+def mcp_log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
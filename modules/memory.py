@@ -5,13 +5,13 @@
 
 # Store & retrieve MemoryItem objects
 
-# Use local embedding server (e.g., Ollama) to vectorize input
+# Vectorize input with a pluggable embedder (Ollama by default, or in-process / hashing)
 
 # Filter memory based on type/tags/session
 
 # Dependencies:
 
-# faiss, requests, pydantic
+# faiss, pydantic, modules/embedders.py, modules/embedding_cache.py
 
 # Used by: context.py, loop.py
 
@@ -24,9 +24,10 @@
 from typing import List, Optional, Literal
 from pydantic import BaseModel
 from datetime import datetime
-import requests
 import numpy as np
 import faiss
+from modules.embedding_cache import get_default_cache
+from modules.embedders import Embedder, OllamaEmbedder
 
 
 class MemoryItem(BaseModel):
@@ -40,20 +41,23 @@ class MemoryItem(BaseModel):
 
 
 class MemoryManager:
-    def __init__(self, embedding_model_url: str, model_name: str = "nomic-embed-text"):
+    def __init__(self, embedding_model_url: str, model_name: str = "nomic-embed-text", embedder: Optional[Embedder] = None):
         self.embedding_model_url = embedding_model_url
         self.model_name = model_name
+        # /api/embeddings takes one prompt per request; /api/embed takes a batch
+        self.embedder = embedder or OllamaEmbedder(
+            model_name, embedding_model_url, batched=embedding_model_url.endswith("/api/embed")
+        )
         self.index: Optional[faiss.IndexFlatL2] = None
         self.data: List[MemoryItem] = []
         self.embeddings: List[np.ndarray] = []
 
-    def _get_embedding(self, text: str) -> np.ndarray:
-        response = requests.post(
-            self.embedding_model_url,
-            json={"model": self.model_name, "prompt": text}
-        )
-        response.raise_for_status()
-        return np.array(response.json()["embedding"], dtype=np.float32)
+    def _get_embedding(self, text: str, query: bool = False) -> np.ndarray:
+        embed_fn = self.embedder.embed_queries if query else self.embedder.embed
+        if not self.embedder.cacheable:
+            return embed_fn([text])[0]
+        name = self.embedder.query_name if query else self.embedder.name
+        return get_default_cache().embed(name, [text], embed_fn)[0]
 
     def add(self, item: MemoryItem):
         embedding = self._get_embedding(item.text)
@@ -76,7 +80,7 @@ class MemoryManager:
         if not self.index or len(self.data) == 0:
             return []
 
-        query_vec = self._get_embedding(query).reshape(1, -1)
+        query_vec = self._get_embedding(query, query=True).reshape(1, -1)
         D, I = self.index.search(query_vec, top_k * 2)  # overfetch for filtering
 
         results = []
@@ -0,0 +1,161 @@
+# modules/ollama_client.py → Pooled Ollama HTTP Client
+# Role: One keep-alive connection pool, timeout policy and retry policy for every Ollama call.
+
+# Responsibilities:
+
+# Reuse pooled connections instead of opening one per request
+
+# Apply connect / read timeouts so a hung model call fails instead of blocking forever
+
+# Retry connection errors, timeouts and 429/5xx responses with exponential backoff
+
+# Offer the same API on httpx.AsyncClient for asyncio callers
+
+# Dependencies:
+
+# requests, httpx, modules/mcp_log.py
+
+# Used by: mcp_server_2.py
+
+# Inputs: URL + JSON payload
+
+# Outputs: Parsed JSON (or streamed JSON lines)
+
+# modules/ollama_client.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Iterator, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules.mcp_log import mcp_log
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        pool_size: int = 16,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, url: str, payload: dict, stream: bool = False) -> requests.Response:
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    response.raise_for_status()
+                    return response
+                response.close()
+                reason = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                reason = type(e).__name__
+            delay = self.backoff * (2 ** attempt)
+            mcp_log("WARN", f"Ollama {url} failed ({reason}); retry {attempt + 1}/{self.retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def post_json(self, url: str, payload: dict) -> dict:
+        with self._post(url, payload) as response:
+            return response.json()
+
+    def stream_json(self, url: str, payload: dict) -> Iterator[dict]:
+        """Yield each JSON line of a streaming response; malformed lines are skipped.
+        Only establishing the stream is retried, never a half-read one."""
+        with self._post(url, payload, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncOllamaClient:
+    """OllamaClient for asyncio code. Bound to the event loop it is first used on."""
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        pool_size: int = 16,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def post_json(self, url: str, payload: dict) -> dict:
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.post(url, json=payload)
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+                reason = f"HTTP {response.status_code}"
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if attempt == self.retries:
+                    raise
+                reason = type(e).__name__
+            delay = self.backoff * (2 ** attempt)
+            mcp_log("WARN", f"Ollama {url} failed ({reason}); retry {attempt + 1}/{self.retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncOllamaClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+
+_default_client: Optional[OllamaClient] = None
+_default_lock = threading.Lock()
+
+
+def get_default_client(**settings) -> OllamaClient:
+    """Process-wide pooled client; `settings` only apply on the first call."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = OllamaClient(**settings)
+        return _default_client
+
+
+def _reset_after_fork() -> None:
+    # Extraction worker processes must not share the parent's pooled sockets
+    global _default_client, _default_lock
+    _default_client = None
+    _default_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
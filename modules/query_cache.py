@@ -0,0 +1,95 @@
+# modules/query_cache.py → Search Result Cache
+# Role: Answer repeated searches from memory without embedding or searching again.
+
+# Responsibilities:
+
+# Key results by (normalized query, k, mode, index version)
+
+# Evict least-recently-used entries past max_entries and entries older than ttl seconds
+
+# Drop everything as soon as a new index version is seen
+
+# Count hits and misses
+
+# Dependencies:
+
+# stdlib only
+
+# Used by: mcp_server_2.py (search_chunks_batch)
+
+# Inputs: Query + k + mode + index version (+ results on put)
+
+# Outputs: Cached results or None, hit/miss stats
+
+# modules/query_cache.py
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Queries that differ only in case, Unicode form or whitespace share a cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._version: Hashable = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, query: str, k: int, mode: str) -> Tuple:
+        return (normalize_query(query), k, mode)
+
+    def _check_version(self, version: Hashable) -> None:
+        # Called with the lock held: results from an older index are never served again
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, query: str, k: int, mode: str, version: Hashable) -> Optional[Any]:
+        key = self._key(query, k, mode)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, k: int, mode: str, version: Hashable, results: Any) -> None:
+        key = self._key(query, k, mode)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
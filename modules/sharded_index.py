@@ -0,0 +1,351 @@
+# modules/sharded_index.py → Sharded Document Index
+# Role: Partition the document vectors into N FAISS shards, one per document hash bucket.
+
+# Responsibilities:
+
+# Route each document to a fixed shard (crc32(doc) % N), so re-indexing it touches one shard
+
+# Keep a write-ahead log per shard and checkpoint only the shards that changed
+
+# Search all shards in parallel and merge their top-k by distance
+
+# Rebuild shards from the chunk store when the shard count, index type or encoding changes
+
+# Dependencies:
+
+# faiss, numpy, modules/index_factory.py, modules/index_wal.py, modules/chunk_store.py, modules/mcp_log.py
+
+# Used by: mcp_server_2.py
+
+# Inputs: (doc, ids, vectors) adds and removals, query vectors
+
+# Outputs: (distances, ids) merged across shards
+
+# modules/sharded_index.py
+
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from modules.chunk_store import ChunkStore
+from modules.index_factory import build_id_index, describe_index, index_spec, new_id_index, trainable
+from modules.index_wal import IndexWAL
+from modules.mcp_log import mcp_log
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _stat(path: Path):
+    try:
+        st = path.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+def _atomic_write_index(index, path: Path) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, path)
+
+
+class _Shard:
+    def __init__(self, directory: Path, number: int):
+        self.number = number
+        self.path = directory / f"shard_{number:03d}.bin"
+        self.wal = IndexWAL(directory / f"shard_{number:03d}.wal")
+        self.index = None
+        self.version = None  # (checkpoint stat, WAL stat) last loaded, for readers
+        self.dirty = False   # has WAL records not yet folded into a checkpoint
+        self.masked = set()  # reader side: logged removals an HNSW index can't apply, filtered at search
+
+    def disk_version(self):
+        return (_stat(self.path), _stat(self.wal.path))
+
+
+class ShardedIndex:
+    """
+    N independent IndexIDMap2 shards over one chunk store. A process that
+    indexes documents calls load(writer=True) and then add / commit_doc /
+    delete_doc / checkpoint; a process that only searches calls refresh()
+    before search() to pick up whatever the writer has logged.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        store: ChunkStore,
+        n_shards: int = 4,
+        kind: str = "auto",
+        encoding: str = "float32",
+    ):
+        self.directory = Path(directory)
+        self.store = store
+        self.n_shards = max(1, n_shards)
+        self.kind = kind
+        self.encoding = encoding
+        self.shards = [_Shard(self.directory, i) for i in range(self.n_shards)]
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.n_shards) if self.n_shards > 1 else None
+
+    # --- routing / bookkeeping ---
+
+    def shard_for(self, doc: str) -> int:
+        return zlib.crc32(doc.encode("utf-8")) % self.n_shards
+
+    def _shard(self, doc: str) -> _Shard:
+        return self.shards[self.shard_for(doc)]
+
+    @property
+    def ntotal(self) -> int:
+        return sum(s.index.ntotal for s in self.shards if s.index is not None)
+
+    @property
+    def version(self) -> tuple:
+        """On-disk state of every shard as last loaded; changes whenever the writer logs or checkpoints."""
+        return tuple(s.version for s in self.shards)
+
+    @property
+    def dirty(self) -> bool:
+        return any(s.dirty for s in self.shards)
+
+    def encodings(self) -> set:
+        return {describe_index(s.index)[1] for s in self.shards if s.index is not None}
+
+    def manifest_matches(self) -> bool:
+        path = self.directory / MANIFEST_FILE
+        if not path.exists():
+            return False
+        return json.loads(path.read_text()).get("n_shards") == self.n_shards
+
+    def _write_manifest(self) -> None:
+        path = self.directory / MANIFEST_FILE
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"n_shards": self.n_shards}, indent=2))
+        os.replace(tmp, path)
+
+    # --- building ---
+
+    def _build_shard(self, number: int, kind: Optional[str] = None, encoding: Optional[str] = None):
+        """Build shard `number` from the vectors its documents have in the chunk store."""
+        docs = [doc for doc in self.store.docs() if self.shard_for(doc) == number]
+        ids, vectors = self.store.all_vectors(docs=docs)
+        if len(ids) == 0:
+            return None
+        kind, encoding = index_spec(kind or self.kind, encoding or self.encoding, len(ids))
+        if not trainable(encoding, len(ids)):
+            # Too small to train PQ yet: start exact; rebuild_if_needed upgrades once it grows
+            kind, encoding = "flat", "float32"
+        return build_id_index(kind, vectors, ids, encoding=encoding)
+
+    def _remove_ids(self, index, number: int, ids: np.ndarray):
+        """Remove `ids` in place; rebuild the shard for index types that can't (HNSW)."""
+        if index is None or len(ids) == 0:
+            return index
+        try:
+            index.remove_ids(np.ascontiguousarray(ids, dtype=np.int64))
+            return index
+        except RuntimeError:
+            kind, encoding = describe_index(index)
+            mcp_log("INFO", f"Shard {number}: {kind} index can't remove vectors in place; rebuilding")
+            return self._build_shard(number, kind, encoding)
+
+    @staticmethod
+    def _mask_ids(shard: _Shard, index, ids: np.ndarray):
+        """Reader side: remove `ids` in place, or hide them at search time if the index can't."""
+        try:
+            index.remove_ids(np.ascontiguousarray(ids, dtype=np.int64))
+        except RuntimeError:
+            # Rebuilding would block queries; the writer's next checkpoint drops them for real
+            shard.masked.update(ids.tolist())
+        return index
+
+    def _read_shard(self, shard: _Shard, doc_hashes: Dict[str, str], writer: bool) -> None:
+        index = faiss.read_index(str(shard.path)) if shard.path.exists() else None
+        shard.masked = set()
+        if writer:
+            remove = lambda idx, ids: self._remove_ids(idx, shard.number, ids)
+        else:
+            remove = lambda idx, ids: self._mask_ids(shard, idx, ids)
+        shard.index = shard.wal.replay(index, doc_hashes, remove, truncate_torn=writer)
+
+    def _reshard(self) -> None:
+        """Rebuild every shard from the chunk store (first run, legacy index, or shard count changed)."""
+        mcp_log("INFO", f"Building {self.n_shards} index shards from the chunk store")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for stale in self.directory.glob("shard_*"):
+            stale.unlink()
+        for shard in self.shards:
+            shard.index = self._build_shard(shard.number)
+            shard.dirty = True
+
+    # --- loading ---
+
+    def load(self, doc_hashes: Optional[Dict[str, str]] = None, writer: bool = False) -> None:
+        """
+        Load every shard checkpoint and replay its WAL. The writer also
+        truncates torn WAL tails, drops orphaned vectors and reshards when
+        the manifest doesn't match.
+        """
+        doc_hashes = {} if doc_hashes is None else doc_hashes
+        if writer and not self.manifest_matches():
+            self._reshard()
+            return
+        for shard in self.shards:
+            shard.version = shard.disk_version()
+            self._read_shard(shard, doc_hashes, writer=writer)
+            shard.dirty = writer and shard.wal.size() > 0
+        if writer:
+            self._drop_orphans()
+
+    def refresh(self) -> bool:
+        """
+        Reader side: reload only shards whose checkpoint or WAL changed on disk.
+        Logged removals an HNSW shard can't apply in place are hidden at search
+        time rather than rebuilt, so a refresh never blocks queries on a rebuild.
+        """
+        changed = False
+        for shard in self.shards:
+            version = shard.disk_version()
+            if version == shard.version:
+                continue
+            with self._lock:
+                if version != shard.version:
+                    self._read_shard(shard, {}, writer=False)
+                    shard.version = version
+                    changed = True
+        return changed
+
+    def _drop_orphans(self) -> None:
+        """Remove ids with no chunk row, left behind if a crash hit between store and WAL writes."""
+        live = set(self.store.all_ids().tolist())
+        for shard in self.shards:
+            if shard.index is None:
+                continue
+            orphans = [i for i in faiss.vector_to_array(shard.index.id_map).tolist() if i not in live]
+            if orphans:
+                mcp_log("WARN", f"Shard {shard.number}: dropping {len(orphans)} orphaned vectors")
+                shard.index = self._remove_ids(shard.index, shard.number, np.array(orphans, dtype=np.int64))
+                shard.dirty = True
+
+    # --- writing ---
+
+    def add(self, doc: str, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Add vectors to `doc`'s shard in memory; durable once commit_doc logs them."""
+        shard = self._shard(doc)
+        if shard.index is None:
+            # Start exact; rebuild_if_needed upgrades once the shard grows
+            shard.index = new_id_index(vectors.shape[1])
+        shard.index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), np.ascontiguousarray(ids, dtype=np.int64))
+
+    def discard(self, doc: str, ids: np.ndarray) -> None:
+        """Drop vectors added for `doc` that will never be committed."""
+        shard = self._shard(doc)
+        shard.index = self._remove_ids(shard.index, shard.number, ids)
+
+    def log_vectors(self, doc: str, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Log vectors already add()ed for `doc`; readers see them from the next refresh()."""
+        shard = self._shard(doc)
+        shard.wal.log_add(ids, vectors)
+        shard.dirty = True
+
+    def finish_doc(self, doc: str, fhash: str, old_ids: np.ndarray) -> None:
+        """Record `doc`'s hash in its shard's WAL and drop its previous vectors."""
+        shard = self._shard(doc)
+        shard.wal.log_remove(old_ids)
+        shard.wal.log_doc(doc, fhash)
+        shard.index = self._remove_ids(shard.index, shard.number, old_ids)
+        shard.dirty = True
+
+    def commit_doc(self, doc: str, fhash: str, ids: np.ndarray, vectors: np.ndarray, old_ids: np.ndarray) -> None:
+        """Log `doc`'s new vectors and hash to its shard's WAL, then drop its previous vectors."""
+        self.log_vectors(doc, ids, vectors)
+        self.finish_doc(doc, fhash, old_ids)
+
+    def delete_doc(self, doc: str, old_ids: np.ndarray) -> None:
+        shard = self._shard(doc)
+        shard.wal.log_remove(old_ids)
+        shard.wal.log_doc(doc, None)
+        shard.index = self._remove_ids(shard.index, shard.number, old_ids)
+        shard.dirty = True
+
+    def checkpoint(self, save_doc_hashes: Callable[[], None]) -> int:
+        """
+        Write dirty shards (atomic rename), then `save_doc_hashes()`, then empty
+        their WALs. Clean shards are not touched. Returns the number written.
+        A crash in between just replays records the checkpoint already holds.
+        """
+        dirty = [s for s in self.shards if s.dirty]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for shard in dirty:
+            if shard.index is not None:
+                _atomic_write_index(shard.index, shard.path)
+            elif shard.path.exists():
+                shard.path.unlink()
+        self._write_manifest()
+        save_doc_hashes()
+        for shard in dirty:
+            shard.wal.reset()
+            shard.dirty = False
+        return len(dirty)
+
+    def rebuild_if_needed(self) -> None:
+        """Rebuild shards whose index type / encoding no longer matches their size and settings."""
+        for shard in self.shards:
+            if shard.index is None or shard.dirty:
+                continue
+            wanted = index_spec(self.kind, self.encoding, shard.index.ntotal)
+            current = describe_index(shard.index)
+            if wanted == current or not trainable(wanted[1], shard.index.ntotal):
+                continue  # too small for PQ keeps its current encoding
+            old_bytes = len(faiss.serialize_index(shard.index))
+            try:
+                rebuilt = self._build_shard(shard.number, *wanted)
+            except Exception as e:
+                mcp_log("WARN", f"Shard {shard.number}: rebuilding as {'/'.join(wanted)} failed ({e}); keeping {'/'.join(current)}")
+                continue
+            if rebuilt is None or rebuilt.ntotal != shard.index.ntotal:
+                mcp_log("WARN", f"Shard {shard.number}: chunk store vectors do not cover the index; keeping {'/'.join(current)}")
+                continue
+            shard.index = rebuilt
+            _atomic_write_index(rebuilt, shard.path)
+            new_bytes = len(faiss.serialize_index(rebuilt))
+            mcp_log("SAVE", f"Shard {shard.number}: rebuilt {'/'.join(current)} → {'/'.join(wanted)}"
+                            f" ({old_bytes / 1e6:.1f} MB → {new_bytes / 1e6:.1f} MB)")
+
+    # --- searching ---
+
+    def search(self, query_vecs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Fan the queries out to every shard in parallel and merge the per-shard top-k."""
+        shards = [(s.index, s.masked) for s in self.shards if s.index is not None and s.index.ntotal]
+        query_vecs = np.ascontiguousarray(query_vecs, dtype=np.float32)
+        if not shards:
+            return (np.empty((len(query_vecs), 0), dtype=np.float32),
+                    np.empty((len(query_vecs), 0), dtype=np.int64))
+
+        def search_one(shard):
+            index, masked = shard
+            if not masked:
+                return index.search(query_vecs, k)
+            # Over-fetch by the number of hidden ids so k live results remain
+            D, I = index.search(query_vecs, k + len(masked))
+            hidden = np.isin(I, np.fromiter(masked, dtype=np.int64, count=len(masked)))
+            D[hidden], I[hidden] = np.inf, -1
+            return D, I
+
+        if self._pool is not None and len(shards) > 1:
+            results: List = list(self._pool.map(search_one, shards))
+        else:
+            results = [search_one(shard) for shard in shards]
+
+        D = np.concatenate([r[0] for r in results], axis=1)
+        I = np.concatenate([r[1] for r in results], axis=1)
+        order = np.argsort(D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)